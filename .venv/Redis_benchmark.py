@@ -0,0 +1,543 @@
+import argparse, importlib, json, multiprocessing, os, random, selectors, signal, socket, subprocess, sys, tempfile, time
+
+
+TESTS: list[str] = [                    # every workload, in the order they run by default
+    'set', 'get', 'mget', 'del', 'lpush', 'lpop', 'lrange', 'hset', 'hget',
+    'get-ttl-keyspace', 'lpush-long-list', 'mget-wide'
+]
+
+
+READ_SIZE: int = 64 * 1024              # max bytes a client reads from a connection at once
+
+
+class NullWriter:
+    """Discards everything printed, so that versions which print their results can be timed"""
+    def write(self, text: str):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def encode_command(args: list[str]) -> bytes:
+    """
+    Returns a command encoded as a RESP2 request: an array of bulk strings.
+    """
+    out = bytearray(b'*%d\r\n' % len(args))
+    for arg in args:
+        data: bytes = arg.encode()
+        out += b'$%d\r\n%b\r\n' % (len(data), data)
+    return bytes(out)
+
+
+def reply_end(data: bytearray, start: int) -> int:
+    """
+    Returns the index just past the RESP2 reply starting at start in data, -1 if the reply is not complete yet.
+    """
+    line: int = data.find(b'\r\n', start)
+    if line < 0:
+        return -1
+    kind: bytes = data[start:start + 1]
+    if kind == b'$':
+        length: int = int(data[start + 1:line])
+        end: int = line + 2 if length < 0 else line + 4 + length
+        return end if end <= len(data) else -1
+    if kind == b'*':
+        end: int = line + 2
+        for _ in range(max(int(data[start + 1:line]), 0)):
+            end = reply_end(data, end)
+            if end < 0:
+                return -1
+        return end
+    return line + 2
+
+
+def take_replies(buffer: bytearray) -> int:
+    """
+    Removes the complete replies at the start of buffer and returns how many there were.
+    """
+    count: int = 0
+    start: int = 0
+    while start < len(buffer):
+        end: int = reply_end(buffer, start)
+        if end < 0:
+            break
+        count += 1
+        start = end
+    del buffer[:start]
+    return count
+
+
+class RemoteRedis:
+    """Sends commands to a Quiq Redis server without timing them, to set up workloads run through the server"""
+    def __init__(self, address: tuple[str,int]):
+        self.sock: socket.socket = socket.create_connection(address)
+        self.buffer = bytearray()
+
+    def dispatch(self, com: str, args: list[str]):
+        self.execute_batch([[com, *args]])
+
+    def execute_batch(self, commands: list[list[str]]):
+        """
+        Sends commands as one pipeline and waits for all their replies.
+        """
+        self.sock.sendall(b''.join(encode_command(command) for command in commands))
+        remaining: int = len(commands)
+        while remaining > 0:
+            data: bytes = self.sock.recv(READ_SIZE)
+            if len(data) == 0:
+                raise ConnectionError('the server closed the connection')
+            self.buffer += data
+            remaining -= take_replies(self.buffer)
+
+    def close(self):
+        self.sock.close()
+
+
+class ClientConnection:
+    """One connection of a benchmark client, sending its requests one pipeline at a time"""
+    def __init__(self, address: tuple[str,int], pipelines: list[tuple[bytes,int]]):
+        """
+        param address: host and port of the server
+        param pipelines: requests to send, each encoded commands and their number
+        """
+        self.sock: socket.socket = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.pipelines: list[tuple[bytes,int]] = pipelines
+        self.sent: int = 0                  # pipelines sent
+        self.remaining: int = 0             # replies still expected to the last pipeline sent
+        self.sent_at: int = 0               # time the last pipeline was sent, in nanoseconds
+        self.buffer = bytearray()
+
+    def send(self):
+        data, self.remaining = self.pipelines[self.sent]
+        self.sent += 1
+        self.sent_at = time.perf_counter_ns()
+        self.sock.sendall(data)
+
+
+def run_client(address: tuple[str,int], connections: list[list[tuple[bytes,int]]], barrier, results):
+    """
+    param address: host and port of the server
+    param connections: requests of each connection of the client, as for ClientConnection
+    param barrier: passed once every client is connected, so that all clients start together
+    param results: queue the client puts its start time, end time and the latency of each pipeline on
+
+    Runs one benchmark client process. Each connection sends one pipeline, waits for all its replies and sends the
+    next, and all connections of the client are in flight at once.
+    """
+    try:
+        clients: list[ClientConnection] = [ClientConnection(address, pipelines) for pipelines in connections]
+        barrier.wait()
+        latencies: list[int] = []
+        selector = selectors.DefaultSelector()
+        start: float = time.monotonic()
+        for client in clients:
+            if len(client.pipelines) > 0:
+                client.send()
+                selector.register(client.sock, selectors.EVENT_READ, client)
+        active: int = len(selector.get_map())
+        while active > 0:
+            for key, _ in selector.select():
+                client: ClientConnection = key.data
+                data: bytes = client.sock.recv(READ_SIZE)
+                if len(data) == 0:
+                    raise ConnectionError('the server closed the connection')
+                client.buffer += data
+                client.remaining -= take_replies(client.buffer)
+                if client.remaining > 0:
+                    continue
+                latencies.append(time.perf_counter_ns() - client.sent_at)
+                if client.sent < len(client.pipelines):
+                    client.send()
+                else:
+                    selector.unregister(client.sock)
+                    active -= 1
+        end: float = time.monotonic()
+        for client in clients:
+            client.sock.close()
+        results.put((start, end, latencies))
+    except Exception as e:
+        barrier.abort()
+        results.put(f'{type(e).__name__}: {e}')
+
+
+class Benchmark:
+    """Runs workloads against one version of the program, directly on a Redis instance or through a server"""
+    def __init__(self, module, options: argparse.Namespace):
+        """
+        param module: Redis_v1, Redis_v2 or Redis_Interview
+        param options: parsed command line options
+        """
+        self.module = module
+        self.options: argparse.Namespace = options
+        self.random: random.Random = random.Random(options.seed)
+        self.value: str = 'x' * options.value_size
+
+    def execute(self, redis, args: list[str]):
+        """
+        Executes one command without timing it, to set up a workload.
+        """
+        if hasattr(redis, 'dispatch'):
+            redis.dispatch(args[0], args[1:])
+        else:
+            redis.execute_command(args[0], args[1:])
+
+    def execute_all(self, redis, commands: list[list[str]]):
+        """
+        Executes commands without timing them, to set up a workload. Commands are batched where possible.
+        """
+        if hasattr(redis, 'execute_batch'):
+            for i in range(0, len(commands), 1000):
+                redis.execute_batch(commands[i:i + 1000])
+        else:
+            for args in commands:
+                self.execute(redis, args)
+
+    def time_commands(self, redis, commands: list[list[str]]) -> tuple[list[int],int]:
+        """
+        Executes commands the way the CLI loop does, cleaning expired keys before each one, and returns
+        the nanoseconds taken by each, and 1. With --pipeline, commands are grouped into batches run by
+        execute_batch, and the nanoseconds taken by each batch and the batch size are returned instead.
+        """
+        latencies: list[int] = []
+        clock: callable = time.perf_counter_ns
+        pipeline: int = self.options.pipeline
+        if pipeline > 1 and hasattr(redis, 'execute_batch'):
+            for i in range(0, len(commands), pipeline):
+                batch: list[list[str]] = commands[i:i + pipeline]
+                start: int = clock()
+                redis.execute_batch(batch)
+                latencies.append(clock() - start)
+            return latencies, pipeline
+        elif hasattr(redis, 'dispatch'):
+            for com, *args in commands:
+                start: int = clock()
+                redis.clean()
+                redis.dispatch(com, args)
+                latencies.append(clock() - start)
+        else:
+            for com, *args in commands:
+                start: int = clock()
+                redis.clean()
+                redis.execute_command(com, args)
+                latencies.append(clock() - start)
+        return latencies, 1
+
+    def populate(self, redis, keys: int, ttl_ratio: float):
+        """
+        Stores keys string values under key:<n>, giving a fraction ttl_ratio of them a one hour lifetime.
+        """
+        self.execute_all(redis, [['SET', f'key:{i}', self.value, 'EX', '3600'] if self.random.random() < ttl_ratio
+                                 else ['SET', f'key:{i}', self.value] for i in range(keys)])
+
+    def random_key(self) -> str:
+        return f'key:{self.random.randrange(self.options.keys)}'
+
+    def workload(self, test: str, redis) -> list[list[str]]:
+        """
+        param test: name of the workload
+        param redis: fresh database, set up for the workload
+
+        Returns the commands of the workload to time.
+        """
+        options: argparse.Namespace = self.options
+        requests: range = range(options.requests)
+        elements: list[str] = [self.value] * options.list_length
+
+        if test == 'set':
+            return [['SET', self.random_key(), self.value, 'EX', '3600']
+                    if self.random.random() < options.ttl_ratio else ['SET', self.random_key(), self.value]
+                    for _ in requests]
+        if test in ('get', 'mget', 'mget-wide', 'get-ttl-keyspace'):
+            if test == 'get-ttl-keyspace':     # every key has a lifetime, stressing expiry housekeeping
+                self.populate(redis, options.ttl_keys, 1.)
+                return [['GET', f'key:{self.random.randrange(options.ttl_keys)}'] for _ in requests]
+            self.populate(redis, options.keys, options.ttl_ratio)
+            if test == 'get':
+                return [['GET', self.random_key()] for _ in requests]
+            width: int = options.mget_width if test == 'mget' else options.wide_mget_width
+            return [['MGET', *[self.random_key() for _ in range(width)]] for _ in requests]
+        if test == 'del':
+            self.populate(redis, options.requests, options.ttl_ratio)
+            return [['DEL', f'key:{i}'] for i in requests]
+        if test == 'lpush':
+            return [['LPUSH', f'list:{i % 100}', self.value] for i in requests]
+        if test == 'lpush-long-list':          # every push is onto a list of list_length elements or more
+            self.execute(redis, ['LPUSH', 'list', *elements])
+            return [['LPUSH', 'list', self.value] for _ in requests]
+        if test == 'lpop':
+            self.execute(redis, ['LPUSH', 'list', *[self.value] * options.requests])
+            return [['LPOP', 'list'] for _ in requests]
+        if test == 'lrange':
+            self.execute(redis, ['LPUSH', 'list', *elements])
+            return [['LRANGE', 'list', '0', str(options.range - 1)] for _ in requests]
+        if test == 'hset':
+            return [['HSET', f'hash:{self.random.randrange(options.keys)}', f'field:{i % options.hash_fields}',
+                     self.value] for i in requests]
+        if test == 'hget':
+            self.execute_all(redis, [['HSET', f'hash:{i}', *[text for k in range(j, min(j + 64, options.hash_fields))
+                                                              for text in (f'field:{k}', self.value)]]
+                                     for i in range(options.keys) for j in range(0, options.hash_fields, 64)])
+            return [['HGET', f'hash:{self.random.randrange(options.keys)}',
+                     f'field:{self.random.randrange(options.hash_fields)}'] for _ in requests]
+        raise ValueError(f"unknown test '{test}'")
+
+    def run(self, test: str) -> dict:
+        """
+        Runs one workload directly on a fresh database and returns its results.
+        """
+        redis = self.module.Redis()
+        stdout = sys.stdout
+        sys.stdout = NullWriter()               # older versions print every result
+        try:
+            commands: list[list[str]] = self.workload(test, redis)
+            latencies, batch = self.time_commands(redis, commands)
+        finally:
+            sys.stdout = stdout
+        return self.results(test, latencies, batch, len(commands), sum(latencies) / 1e9, {'mode': 'direct'})
+
+    def run_served(self, test: str, shards: int) -> dict:
+        """
+        Runs one workload through a freshly started server and returns its results: a single server if shards
+        is 0, else a sharded server of that many shards. The commands are spread over --clients processes of
+        --connections connections each, all in flight at once, and sent --pipeline commands at a time.
+        """
+        options: argparse.Namespace = self.options
+        with tempfile.TemporaryDirectory() as directory:
+            server, address = self.start_server(shards, directory)
+            try:
+                remote = RemoteRedis(address)
+                commands: list[list[str]] = self.workload(test, remote)
+                remote.close()
+
+                streams: int = options.clients * options.connections
+                connections: list[list[tuple[bytes,int]]] = []
+                for stream in range(streams):
+                    mine: list[list[str]] = commands[stream::streams]
+                    connections.append([(b''.join(encode_command(command) for command in mine[i:i + options.pipeline]),
+                                         len(mine[i:i + options.pipeline])) for i in range(0, len(mine), options.pipeline)])
+
+                context = multiprocessing.get_context()
+                barrier = context.Barrier(options.clients + 1)
+                queue = context.Queue()
+                clients: list = [context.Process(target=run_client, args=(address, connections[i::options.clients],
+                                                                          barrier, queue))
+                                 for i in range(options.clients)]
+                for client in clients:
+                    client.start()
+                outcomes: list = []
+                try:
+                    barrier.wait(60)
+                finally:
+                    for _ in clients:
+                        outcomes.append(queue.get())
+                    for client in clients:
+                        client.join()
+            finally:
+                self.stop_server(server)
+
+        for outcome in outcomes:
+            if type(outcome) is str:
+                raise Exception(f'benchmark client failed: {outcome}')
+        latencies: list[int] = [latency for _, _, times in outcomes for latency in times]
+        seconds: float = max(end for _, end, _ in outcomes) - min(start for start, _, _ in outcomes)
+        return self.results(test, latencies, options.pipeline, len(commands), seconds,
+                            {'mode': 'server', 'shards': shards, 'routers': options.routers if shards > 0 else 1,
+                             'connections': streams})
+
+    def start_server(self, shards: int, directory: str) -> tuple[subprocess.Popen,tuple[str,int]]:
+        """
+        Starts a server keeping its files in directory, on a free port, and waits until it accepts connections.
+        Returns the server process and its address.
+        """
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            address: tuple[str,int] = probe.getsockname()
+        if shards == 0:
+            command: list[str] = [sys.executable, self.module.__file__, '--serve']
+        else:
+            command = [sys.executable, os.path.join(os.path.dirname(self.module.__file__), 'Redis_cluster.py'),
+                       '--shards', str(shards), '--routers', str(self.options.routers)]
+        server = subprocess.Popen([*command, '--port', str(address[1]), '--dir', directory], stdout=subprocess.DEVNULL)
+        deadline: float = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(address).close()
+                return server, address
+            except OSError:
+                if server.poll() is not None or time.monotonic() > deadline:
+                    self.stop_server(server)
+                    raise Exception(f"server did not start: {' '.join(command)}")
+                time.sleep(.05)
+
+    @staticmethod
+    def stop_server(server: subprocess.Popen):
+        """
+        Shuts a server down as Ctrl-C does, or kills it if it does not exit.
+        """
+        if server.poll() is None:
+            server.send_signal(signal.SIGINT)
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+    @staticmethod
+    def results(test: str, latencies: list[int], batch: int, requests: int, seconds: float, run: dict) -> dict:
+        """
+        param test: name of the workload
+        param latencies: nanoseconds taken by each command, or by each batch of batch commands
+        param batch: commands timed together
+        param requests: commands run
+        param seconds: time taken by all of them
+        param run: how the workload was run: mode, and for a server, its shards, routers and client connections
+
+        Returns the results of a workload.
+        """
+        latencies.sort()
+
+        def percentile(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] / 1000
+
+        prefix: str = '' if batch == 1 else 'batch_'    # latencies of whole batches are never mistaken for commands
+        return {
+            'test': test,
+            **run,
+            'pipeline': batch,
+            'latency': 'command' if batch == 1 else 'batch',
+            'requests': requests,
+            'seconds': seconds,
+            'ops_per_sec': requests / seconds if seconds > 0 else 0.,
+            f'{prefix}p50_usec': percentile(.5),
+            f'{prefix}p99_usec': percentile(.99),
+            f'{prefix}p999_usec': percentile(.999),
+            f'{prefix}max_usec': latencies[-1] / 1000,
+        }
+
+
+def run_label(result: dict) -> str:
+    """
+    Returns how a workload was run, as shown in the report: direct, server, or the shards and routers of a
+    sharded server.
+    """
+    if result.get('mode', 'direct') == 'direct':
+        return 'direct'
+    if result['shards'] == 0:
+        return 'server'
+    label: str = f"{result['shards']} shard{'s' if result['shards'] > 1 else ''}"
+    return label if result['routers'] == 1 else f"{label}, {result['routers']} routers"
+
+
+def regressions(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    """
+    param results: results of this run
+    param baseline: JSON report of an earlier run
+    param threshold: fraction by which throughput may drop before it counts as a regression
+
+    Returns a description of every test whose throughput dropped by more than threshold. Results are only
+    compared with results of the same test run the same way: directly or through the same kind of server, with
+    as many client connections and commands per batch.
+    """
+    def run(result: dict) -> tuple:
+        return (result['test'], result.get('mode', 'direct'), result.get('shards', 0), result.get('routers', 1),
+                result.get('connections', 1), result.get('pipeline', 1))
+
+    before: dict[tuple,dict] = {run(result): result for result in baseline['results']}
+    found: list[str] = []
+    for result in results:
+        old: dict = before.get(run(result))
+        if old is not None and result['ops_per_sec'] < old['ops_per_sec'] * (1 - threshold):
+            name: str = f"{result['test']} ({run_label(result)})"
+            found.append(f"{name}: {old['ops_per_sec']:.0f} -> {result['ops_per_sec']:.0f} ops/sec")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quiq Redis benchmark: times commands run directly on a Redis '
+                                                 'instance, or through servers, and reports throughput and latency '
+                                                 'percentiles.')
+    parser.add_argument('--module', default='Redis_v2', help='version to benchmark: Redis_v1, Redis_v2 or Redis_Interview')
+    parser.add_argument('--tests', default=','.join(TESTS), help='comma separated workloads to run')
+    parser.add_argument('--requests', type=int, default=10000, help='commands timed per workload')
+    parser.add_argument('--keys', type=int, default=10000, help='keys in the keyspace of string and hash workloads')
+    parser.add_argument('--value-size', type=int, default=16, help='characters in each value')
+    parser.add_argument('--ttl-ratio', type=float, default=0.1, help='fraction of keys set with a lifetime')
+    parser.add_argument('--ttl-keys', type=int, default=100000, help='keys with a lifetime for get-ttl-keyspace')
+    parser.add_argument('--list-length', type=int, default=10000, help='elements in the list of list workloads')
+    parser.add_argument('--range', type=int, default=100, help='elements read by each LRANGE')
+    parser.add_argument('--hash-fields', type=int, default=10, help='fields of each hash')
+    parser.add_argument('--mget-width', type=int, default=10, help='keys read by each MGET')
+    parser.add_argument('--wide-mget-width', type=int, default=1000, help='keys read by each MGET of mget-wide')
+    parser.add_argument('--pipeline', type=int, default=1, help='commands per execute_batch call, where available, '
+                                                                 'or per request sent to a server')
+    parser.add_argument('--shards', help='comma separated shard counts, e.g. 0,1,2,4: runs every workload through a '
+                                         'server of each size, 0 for a single server, to show how throughput scales')
+    parser.add_argument('--routers', type=int, default=1, help='router processes of sharded servers')
+    parser.add_argument('--clients', type=int, default=4, help='client processes sending commands to a server')
+    parser.add_argument('--connections', type=int, default=8, help='connections of each client process')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random key choices')
+    parser.add_argument('--json', help="write the report as JSON to this file, '-' for standard output")
+    parser.add_argument('--baseline', help='JSON report of an earlier run to compare throughput against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='throughput drop counted as a regression')
+    options = parser.parse_args()
+
+    tests: list[str] = [test.strip().lower() for test in options.tests.split(',') if test.strip()]
+    unknown: list[str] = [test for test in tests if test not in TESTS]
+    if len(unknown) > 0:
+        parser.error(f"unknown tests: {', '.join(unknown)} (choose from {', '.join(TESTS)})")
+
+    try:
+        shard_counts: list[int] = [int(count) for count in options.shards.split(',')] if options.shards else []
+    except ValueError:
+        parser.error('--shards must be comma separated numbers')
+    if any(count < 0 for count in shard_counts):
+        parser.error('--shards must not be negative')
+    if min(options.pipeline, options.routers, options.clients, options.connections) < 1:
+        parser.error('--pipeline, --routers, --clients and --connections must be at least 1')
+
+    module = importlib.import_module(options.module)
+    if 0 in shard_counts and not hasattr(module, 'serve'):
+        parser.error(f'{options.module} has no server mode')
+    if any(count > 0 for count in shard_counts) and options.module != 'Redis_v2':
+        parser.error('sharded servers run Redis_v2')
+
+    benchmark = Benchmark(module, options)
+    results: list[dict] = []
+    report = sys.stderr if options.json == '-' else sys.stdout
+    print(f"{'test':<18}{'run':>22}{'ops/sec':>12}{'latency of':>14}{'p50 usec':>12}{'p99 usec':>12}"
+          f"{'p999 usec':>12}", file=report)
+    for test in tests:
+        for shards in shard_counts or [None]:
+            result: dict = benchmark.run(test) if shards is None else benchmark.run_served(test, shards)
+            results.append(result)
+            prefix: str = '' if result['pipeline'] == 1 else 'batch_'
+            unit: str = 'command' if result['pipeline'] == 1 else f"{result['pipeline']} commands"
+            print(f"{test:<18}{run_label(result):>22}{result['ops_per_sec']:>12.0f}{unit:>14}"
+                  f"{result[prefix + 'p50_usec']:>12.1f}{result[prefix + 'p99_usec']:>12.1f}"
+                  f"{result[prefix + 'p999_usec']:>12.1f}", file=report)
+
+    document: dict = {
+        'module': options.module,
+        'python': sys.version.split()[0],
+        'options': {name: value for name, value in vars(options).items() if name not in ('json', 'baseline')},
+        'results': results,
+    }
+    if options.json == '-':
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    elif options.json:
+        with open(options.json, 'w') as file:
+            json.dump(document, file, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            found: list[str] = regressions(results, json.load(file), options.threshold)
+        for regression in found:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if len(found) > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
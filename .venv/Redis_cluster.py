@@ -0,0 +1,691 @@
+import argparse, asyncio, multiprocessing, os, pickle, select, signal, socket, struct, sys, time
+from binascii import crc_hqx
+from collections import deque
+
+from Redis_v2 import CONFIG_DEFAULTS, CRON_INTERVAL, KEY_SPECS, READ_SIZE, Client, Error, Redis, Text, \
+    render_cli, serve
+
+
+HASH_SLOTS: int = 16384                 # slots the keyspace is divided into, as in Redis Cluster
+UNSHARDED_COMMANDS: set[str] = {        # commands that cannot be split over shards
+    'MULTI', 'EXEC', 'DISCARD'
+}
+FRAME = struct.Struct('<Q')             # length of each pickled message between a router and a shard
+SHARD_FILE_PARAMETERS: set[str] = {     # configuration parameters naming files, suffixed by the shard index
+    'dbfilename', 'appendfilename'
+}
+INFO_MAX_FIELDS: set[str] = {           # INFO fields merged over shards by taking the largest value, others are summed
+    'uptime_in_seconds', 'aof_enabled', 'rdb_bgsave_in_progress', 'aof_rewrite_in_progress', 'usec_max'
+}
+INFO_MIN_FIELDS: set[str] = {           # INFO fields merged over shards by taking the smallest value
+    'rdb_last_save_time'
+}
+INFO_SORTED_SECTIONS: set[str] = {      # INFO sections listed in name order, as a single instance lists them
+    '# Commandstats', '# Errorstats'
+}
+
+
+def key_slot(key: str) -> int:
+    """
+    Returns the hash slot of a key: the CRC16 (XMODEM) of the key modulo 16384, as Redis Cluster computes it.
+    If the key contains a hashtag, a non empty substring between the first { and the next }, only the hashtag
+    is hashed, so keys such as {user:1}:name and {user:1}:email are always stored on the same shard.
+    """
+    if '{' in key:
+        start: int = key.find('{')
+        end: int = key.find('}', start + 1)
+        if end > start + 1:
+            key = key[start + 1:end]
+    return crc_hqx(key.encode('utf-8', 'surrogateescape'), 0) & (HASH_SLOTS - 1)
+
+
+def shard_file(filename: str, index: int) -> str:
+    """
+    Returns a file name suffixed by a shard index, e.g. dump-1.qdb for dump.qdb.
+    """
+    stem, extension = os.path.splitext(filename)
+    return f'{stem}-{index}{extension}'
+
+
+def shard_config(config: dict[str,str], index: int) -> dict[str,str]:
+    """
+    Returns the configuration of one shard: config, with the snapshot and append only file names
+    suffixed by the shard index so shards persist to separate files.
+    """
+    config = {**CONFIG_DEFAULTS, **(config or {})}
+    for name in SHARD_FILE_PARAMETERS:
+        config[name] = shard_file(config[name], index)
+    return config
+
+
+def shard_command(command: list[str], index: int) -> list[str]:
+    """
+    Returns a command without keys as sent to one shard: CONFIG SET of a file name is suffixed by the shard
+    index, as shard_config does, so shards keep persisting to separate files. Other commands are unchanged.
+    """
+    if len(command) == 4 and command[1].upper() == 'SET' and command[2].lower() in SHARD_FILE_PARAMETERS:
+        return [*command[:3], shard_file(command[3], index)]
+    return command
+
+
+def pack_message(message) -> bytes:
+    """
+    Returns message pickled and prefixed with its length, as sent between a router and a shard.
+    """
+    payload: bytes = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    return FRAME.pack(len(payload)) + payload
+
+
+class Channel:
+    """Pickled messages, each prefixed with its length, over one end of a stream socket pair"""
+    def __init__(self, sock: socket.socket):
+        self.sock: socket.socket = sock
+        self.buffer = bytearray()           # received bytes of messages not yet complete
+        self.received: deque = deque()      # complete messages not yet taken, oldest first
+
+    def send(self, message):
+        self.sock.sendall(pack_message(message))
+
+    def fill(self) -> bool:
+        """
+        Reads the bytes available on the socket, waiting for some if there are none.
+        Returns False once the other end is closed.
+        """
+        data: bytes = self.sock.recv(READ_SIZE)
+        self.buffer += data
+        return len(data) > 0
+
+    def parse(self):
+        """
+        Moves every complete message from the buffer to received.
+        """
+        buffer: bytearray = self.buffer
+        start: int = 0
+        while len(buffer) - start >= FRAME.size:
+            end: int = start + FRAME.size + FRAME.unpack_from(buffer, start)[0]
+            if end > len(buffer):
+                break
+            self.received.append(pickle.loads(buffer[start + FRAME.size:end]))
+            start = end
+        del buffer[:start]
+
+    def messages(self) -> list:
+        """
+        Removes and returns every complete message received so far.
+        """
+        self.parse()
+        messages: list = list(self.received)
+        self.received.clear()
+        return messages
+
+    def receive(self):
+        """
+        Removes and returns the next message, waiting for it. Raises EOFError if the other end is closed first.
+        """
+        self.parse()
+        while len(self.received) == 0:
+            if not self.fill():
+                raise EOFError
+            self.parse()
+        return self.received.popleft()
+
+    def close(self):
+        self.sock.close()
+
+
+def run_shard(control_sock: socket.socket, links: list[socket.socket], config: dict[str,str]):
+    """
+    param control_sock: socket to the process that started the shard
+    param links: socket to each router
+    param config: configuration of the shard's Redis instance
+
+    Runs one shard process. Loads the shard's data and reports the outcome over control. Then executes the
+    commands routers send: each message is a list of batches of commands, answered with the list of their
+    results. Housekeeping runs between messages, every CRON_INTERVAL seconds. The shard exits once the
+    control socket sends None or is closed.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # the process that started the shard shuts it down
+    control: Channel = Channel(control_sock)
+    channels: dict[socket.socket,Channel] = {sock: Channel(sock) for sock in links}
+    redis = Redis(config)
+    try:
+        redis.load()
+    except Exception as e:
+        control.send(f"Fatal error loading the DB: {e}")
+        return
+    control.send(None)
+
+    last_cron: float = time.monotonic()
+    try:
+        while True:
+            readable: list = select.select([control.sock, *channels], [], [], CRON_INTERVAL)[0]
+            if control.sock in readable and (not control.fill() or len(control.messages()) > 0):
+                break
+            for sock in readable:
+                channel: Channel = channels.get(sock)
+                if channel is None:
+                    continue
+                if not channel.fill():              # the router exited
+                    del channels[sock]
+                    channel.close()
+                    continue
+                for batches in channel.messages():
+                    channel.send([redis.execute_batch(commands) for commands in batches])
+            if time.monotonic() - last_cron >= CRON_INTERVAL:
+                redis.cron()
+                last_cron = time.monotonic()
+    except ConnectionError:
+        pass
+    finally:
+        redis.close()
+
+
+def start_shards(count: int, config: dict[str,str], routers: int = 1) -> tuple[list,list[Channel],list[list[Channel]]]:
+    """
+    param count: number of shard processes
+    param config: configuration parameters overriding CONFIG_DEFAULTS, applied to every shard
+    param routers: number of routers each shard is linked to
+
+    Starts the shards and waits for them to load their data. Returns the shard processes, the control channel
+    to each shard, and for each router its channel to each shard.
+    """
+    if count < 1:
+        raise ValueError('at least one shard is required')
+    context = multiprocessing.get_context()
+    processes: list = []
+    controls: list[Channel] = []
+    links: list[list[Channel]] = [[] for _ in range(routers)]
+    for index in range(count):
+        control, shard_control = socket.socketpair()
+        pairs: list[tuple[socket.socket,socket.socket]] = [socket.socketpair() for _ in range(routers)]
+        process = context.Process(target=run_shard, name=f'shard-{index}', daemon=True,
+                                  args=(shard_control, [shard_end for _, shard_end in pairs], shard_config(config, index)))
+        process.start()
+        shard_control.close()
+        for router, (router_end, shard_end) in enumerate(pairs):
+            shard_end.close()
+            links[router].append(Channel(router_end))
+        processes.append(process)
+        controls.append(Channel(control))
+
+    for index, control in enumerate(controls):
+        try:
+            failure: str = control.receive()
+        except (EOFError, ConnectionError):
+            failure = 'shard exited'
+        if failure is not None:
+            for channel in (channel for channels in links for channel in channels):
+                channel.close()
+            stop_shards(processes, controls)
+            raise Exception(f'shard {index}: {failure}')
+    return processes, controls, links
+
+
+def stop_shards(processes: list, controls: list[Channel]):
+    """
+    Shuts every shard down, letting each flush its append only file, and waits for them to exit.
+    """
+    for control in controls:
+        try:
+            control.send(None)
+        except OSError:
+            pass
+    for process in processes:
+        process.join(10)
+        if process.is_alive():
+            process.terminate()
+    for control in controls:
+        control.close()
+
+
+def merge_info(texts: list[str], overrides: dict[str,any]) -> str:
+    """
+    param texts: INFO reply of each shard
+    param overrides: fields reported by the router itself rather than by the shards
+
+    Returns one INFO reply for the whole data set: the union of the shards' sections and fields, each value
+    merged by merge_info_value.
+    """
+    sections: dict[str,dict[str,list[str]]] = {}    # section header to field to the shards' values
+    for text in texts:
+        fields: dict[str,list[str]] = None
+        for line in text.split('\r\n'):
+            if line.startswith('# '):
+                fields = sections.setdefault(line, {})
+            elif ':' in line and fields is not None:
+                field, value = line.split(':', 1)
+                fields.setdefault(field, []).append(value)
+
+    lines: list[str] = []
+    for header, fields in sections.items():
+        if len(lines) > 0:
+            lines.append('')
+        lines.append(header)
+        for field in (sorted(fields) if header in INFO_SORTED_SECTIONS else fields):
+            value = overrides[field] if field in overrides else merge_info_value(field, fields[field])
+            lines.append(f'{field}:{value}')
+    return '\r\n'.join(lines)
+
+
+def merge_info_value(field: str, values: list[str]) -> str:
+    """
+    Returns the value of an INFO field over the shards: the sum of integers, except for INFO_MAX_FIELDS and
+    INFO_MIN_FIELDS, the first shard's value of anything else. Values holding name=value lists, such as
+    calls=3,usec=12, are merged name by name, and usec_per_call is recomputed from the merged totals.
+    """
+    if '=' in values[0]:
+        items: dict[str,list[str]] = {}
+        for value in values:
+            for item in value.split(','):
+                name, _, number = item.partition('=')
+                items.setdefault(name, []).append(number)
+        merged: dict[str,str] = {name: merge_info_value(name, numbers) for name, numbers in items.items()}
+        if 'usec_per_call' in merged:
+            merged['usec_per_call'] = f"{int(merged['usec']) / max(int(merged['calls']), 1):.2f}"
+        return ','.join(f'{name}={value}' for name, value in merged.items())
+
+    if not all(value.lstrip('-').isascii() and value.lstrip('-').isdigit() for value in values):
+        return values[0]
+    numbers: list[int] = [int(value) for value in values]
+    if field in INFO_MAX_FIELDS:
+        return str(max(numbers))
+    if field in INFO_MIN_FIELDS:
+        return str(min(numbers))
+    return str(sum(numbers))
+
+
+def merge_slowlog(replies: list[list], count: int) -> list:
+    """
+    param replies: SLOWLOG GET reply of each shard
+    param count: max entries, -1 for all
+
+    Returns the newest count entries over all shards, newest first. Entry ids are renumbered to
+    id * shards + shard, so they stay unique and increasing on each shard.
+    """
+    entries: list = [[id * len(replies) + shard, *rest] for shard, reply in enumerate(replies)
+                     for id, *rest in reply]
+    entries.sort(key=lambda entry: (entry[1], entry[0]), reverse=True)
+    return entries if count == -1 else entries[:count]
+
+
+def merge_histograms(replies: list[list], commands: list[str]) -> list:
+    """
+    param replies: LATENCY HISTOGRAM reply of each shard
+    param commands: command names given to LATENCY HISTOGRAM, empty for all
+
+    Returns the histograms of each command over all shards: calls and the count of each bucket are added up.
+    """
+    merged: dict[str,tuple[list[int],dict[int,int]]] = {}  # command name to its calls and count of each bucket
+    for reply in replies:
+        for name, (_, calls, _, histogram) in zip(reply[::2], reply[1::2]):
+            total, buckets = merged.setdefault(name, ([0], {}))
+            total[0] += calls
+            cumulative: int = 0
+            for bucket, count in zip(histogram[::2], histogram[1::2]):
+                buckets[bucket] = buckets.get(bucket, 0) + count - cumulative
+                cumulative = count
+
+    names: list[str] = [com.lower() for com in commands if com.lower() in merged] or sorted(merged)
+    result: list = []
+    for name in names:
+        total, buckets = merged[name]
+        histogram: list[int] = []
+        cumulative: int = 0
+        for bucket in sorted(buckets):
+            cumulative += buckets[bucket]
+            histogram += [bucket, cumulative]
+        result += [name, ['calls', total[0], 'histogram_usec', histogram]]
+    return result
+
+
+class ShardedRedis:
+    """
+    Routes commands to shards, worker processes that each own a Redis instance holding the keys of a range
+    of hash slots, so that commands run on as many cores as there are shards.
+    """
+    def __init__(self, shards: int = 0, config: dict[str,str] = None, channels: list[Channel] = None):
+        """
+        param shards: number of shard processes to start
+        param config: configuration parameters overriding CONFIG_DEFAULTS, applied to every shard
+        param channels: channel to each shard of shards started by start_shards, to route over instead of
+                        starting shards; the shards are then shut down by whoever started them
+        """
+        self.processes: list = []
+        self.controls: list[Channel] = []
+        if channels is None:
+            self.processes, self.controls, (channels,) = start_shards(shards, config)
+        self.channels: list[Channel] = channels
+        self.active: bool = True
+        self.client: Client = Client()
+        self.connected_clients: int = 0          # open server connections
+        self.total_connections: int = 0          # server connections accepted
+        self.slots: list[int] = [slot * len(channels) // HASH_SLOTS for slot in range(HASH_SLOTS)]  # slot to shard
+        self.connecting: asyncio.Task = None     # switches the channels over to the event loop, on first use
+        self.writers: list[asyncio.StreamWriter] = None     # set once the channels are switched over
+        self.readers: list[asyncio.Task] = []
+        self.queues: list[list[tuple[list,asyncio.Future]]] = [[] for _ in channels]   # batches not yet sent
+        self.waiting: list[deque] = [deque() for _ in channels]    # futures of each message sent, oldest first
+        self.flushing: bool = False              # queues are sent at the end of the current event loop iteration
+
+    def shard(self, key: str) -> int:
+        """
+        Returns the index of the shard owning key.
+        """
+        return self.slots[key_slot(key)]
+
+    def execute_command(self, com: str, args: list[str]):
+        """
+        Executes a command and prints the result as the Redis CLI does.
+        """
+        print(render_cli(self.dispatch(com, args)), end='')
+
+    def dispatch(self, com: str, args: list[str]):
+        """
+        Executes a command on the shards that own its keys and returns its result.
+        """
+        return self.execute_batch([[com, *args]])[0]
+
+    def execute_batch(self, commands: list[list[str]]) -> list:
+        """
+        param commands: list of commands, each a list of the command string followed by its arguments
+
+        Executes the commands and returns the list of their results, in order, waiting for the shards to reply.
+        When serving, execute_batch_async is used instead, so that the event loop keeps running meanwhile.
+        """
+        if self.connecting is not None:
+            raise RuntimeError('the router is serving, use execute_batch_async')
+        batches, plan = self.route(commands)
+        for channel, batch in zip(self.channels, batches):
+            if len(batch) > 0:
+                channel.send([batch])
+        results: list[list] = [channel.receive()[0] if len(batch) > 0 else []
+                               for channel, batch in zip(self.channels, batches)]
+        return self.assemble(plan, results)
+
+    async def execute_batch_async(self, commands: list[list[str]]) -> list:
+        """
+        param commands: list of commands, each a list of the command string followed by its arguments
+
+        Executes the commands and returns the list of their results, in order, as execute_batch does.
+        The commands for each shard are queued, and the queues are sent once the event loop has handled every
+        connection that is ready, so that batches from many connections travel to each shard in one message
+        and are in flight on all shards at once.
+        """
+        if self.writers is None:
+            if self.connecting is None:
+                self.connecting = asyncio.create_task(self.connect())
+            await self.connecting
+        batches, plan = self.route(commands)
+        futures: dict[int,asyncio.Future] = {shard: self.submit(shard, batch)
+                                             for shard, batch in enumerate(batches) if len(batch) > 0}
+        results: list[list] = [[] for _ in self.channels]
+        for shard, future in futures.items():
+            results[shard] = await future
+        return self.assemble(plan, results)
+
+    async def connect(self):
+        """
+        Switches the channels to the shards over to the event loop, and starts reading replies from them.
+        """
+        writers: list[asyncio.StreamWriter] = []
+        for shard, channel in enumerate(self.channels):
+            reader, writer = await asyncio.open_connection(sock=channel.sock, limit=READ_SIZE)
+            writers.append(writer)
+            self.readers.append(asyncio.create_task(self.receive_replies(shard, reader)))
+        self.writers = writers
+
+    def submit(self, shard: int, batch: list[list[str]]) -> asyncio.Future:
+        """
+        Queues a batch of commands for a shard. Returns the future of the batch's results.
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self.queues[shard].append((batch, future))
+        if not self.flushing:
+            self.flushing = True
+            loop.call_soon(self.flush)
+        return future
+
+    def flush(self):
+        """
+        Sends the batches queued for each shard, as one message per shard.
+        """
+        self.flushing = False
+        for shard, queue in enumerate(self.queues):
+            if len(queue) == 0:
+                continue
+            self.queues[shard] = []
+            writer: asyncio.StreamWriter = self.writers[shard]
+            if writer.is_closing():
+                for _, future in queue:
+                    future.set_exception(ConnectionError(f'shard {shard} exited'))
+                continue
+            writer.write(pack_message([batch for batch, _ in queue]))
+            self.waiting[shard].append([future for _, future in queue])
+
+    async def receive_replies(self, shard: int, reader: asyncio.StreamReader):
+        """
+        Reads the replies of a shard, in the order the messages were sent, and resolves the futures of
+        their batches.
+        """
+        waiting: deque = self.waiting[shard]
+        try:
+            while True:
+                size: int = FRAME.unpack(await reader.readexactly(FRAME.size))[0]
+                results: list[list] = pickle.loads(await reader.readexactly(size))
+                for future, result in zip(waiting.popleft(), results):
+                    if not future.done():
+                        future.set_result(result)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.writers[shard].close()
+            while waiting:
+                for future in waiting.popleft():
+                    if not future.done():
+                        future.set_exception(ConnectionError(f'shard {shard} exited'))
+
+    def route(self, commands: list[list[str]]) -> tuple[list[list[list[str]]],list]:
+        """
+        param commands: list of commands, each a list of the command string followed by its arguments
+
+        Splits the commands into one batch per shard:
+            single key commands -- run on the shard owning the key
+            multi key commands -- such as MGET and DEL, split into one command per shard holding some of the keys
+            commands without keys -- run on every shard
+        Commands run in order on each shard. Commands on different shards touch different keys, so the results
+        are the same as if every command had run in order on one Redis instance.
+        Returns the batches, and the plan assemble() follows to build the result of each command.
+        """
+        batches: list[list[list[str]]] = [[] for _ in self.channels]
+        plan: list = []                 # per command: its result, or where to collect the parts of its result
+        resolved: dict[str,tuple[str,tuple]] = {}       # command string to name and key spec
+        slots: list[int] = self.slots
+        for command in commands:
+            found: tuple[str,tuple] = resolved.get(command[0])
+            if found is None:
+                name: str = command[0].upper()
+                found = resolved[command[0]] = (name, KEY_SPECS.get(name))
+            name, spec = found
+
+            if spec is None:
+                if name in UNSHARDED_COMMANDS:
+                    plan.append(Error(f"ERR {name} is not supported in sharded mode"))
+                    continue
+                plan.append(('all', [(shard, len(batch)) for shard, batch in enumerate(batches)], name, command))
+                for shard, batch in enumerate(batches):
+                    batch.append(command if name != 'CONFIG' else shard_command(command, shard))
+                continue
+
+            first, last = spec
+            if len(command) <= first + 1:           # missing its key, any shard reports the error
+                shard = 0
+            elif last >= 0 or len(command) == first + 2:
+                shard = slots[key_slot(command[first + 1])]
+            else:                                   # every argument is a key, e.g. MGET or DEL
+                positions: dict[int,list[int]] = {}     # shard to positions of its keys in the arguments
+                for position, key in enumerate(command[first + 1:]):
+                    positions.setdefault(slots[key_slot(key)], []).append(position)
+                if len(positions) == 1:
+                    shard = next(iter(positions))
+                else:
+                    keys: list[str] = command[first + 1:]
+                    parts: list[tuple[int,int,list[int]]] = []
+                    for shard, held in positions.items():
+                        parts.append((shard, len(batches[shard]), held))
+                        batches[shard].append([*command[:first + 1], *[keys[i] for i in held]])
+                    plan.append(('split', parts, len(keys)))
+                    continue
+            plan.append(('one', shard, len(batches[shard])))
+            batches[shard].append(command)
+        return batches, plan
+
+    def assemble(self, plan: list, results: list[list]) -> list:
+        """
+        param plan: plan returned by route()
+        param results: results of the batch sent to each shard
+
+        Returns the result of each command routed.
+        """
+        replies: list = []
+        for step in plan:
+            if type(step) is Error:
+                replies.append(step)
+            elif step[0] == 'one':
+                replies.append(results[step[1]][step[2]])
+            elif step[0] == 'split':
+                replies.append(self.merge(results, step[1], step[2]))
+            else:
+                replies.append(self.merge_all(step[2], step[3], [results[shard][index] for shard, index in step[1]]))
+        return replies
+
+    @staticmethod
+    def merge(results: list[list], parts: list[tuple[int,int,list[int]]], count: int):
+        """
+        param results: results of the batch sent to each shard
+        param parts: shard, index in its batch and positions of its keys, for each part of a multi key command
+        param count: number of keys of the command
+
+        Returns the result of a multi key command from the results of its parts: the first error, the sum of
+        integer results, or array results merged into the order of the keys.
+        """
+        replies: list = [results[shard][index] for shard, index, _ in parts]
+        for reply in replies:
+            if type(reply) is Error:
+                return reply
+        if type(replies[0]) is int:
+            return sum(replies)
+        merged: list = [None] * count
+        for (_, _, positions), reply in zip(parts, replies):
+            for position, value in zip(positions, reply):
+                merged[position] = value
+        return merged
+
+    def merge_all(self, name: str, command: list[str], replies: list):
+        """
+        param name: upper case Redis command string
+        param command: the command string followed by its arguments
+        param replies: result of the command on each shard
+
+        Returns the result of a command without keys, run on every shard: the first error, INFO, SLOWLOG GET
+        and LATENCY HISTOGRAM merged over the shards, the sum of integer results (e.g. SLOWLOG LEN), or else the
+        first shard's result, which every shard returns alike (e.g. CONFIG GET or OK).
+        """
+        for reply in replies:
+            if type(reply) is Error:
+                return reply
+        if name == 'INFO':
+            return Text(merge_info(replies, {'process_id': os.getpid(), 'connected_clients': self.connected_clients,
+                                             'total_connections_received': self.total_connections}))
+        if name == 'SLOWLOG' and command[1].upper() == 'GET':
+            return merge_slowlog(replies, int(command[2]) if len(command) > 2 else 10)
+        if name == 'LATENCY':
+            return merge_histograms(replies, command[2:])
+        if all(type(reply) is int for reply in replies):
+            return sum(replies)
+        return replies[0]
+
+    def cron(self):
+        """
+        Shards run their own housekeeping between messages, so the router has none.
+        """
+
+    def close(self):
+        """
+        Closes the channels to the shards, and shuts the shards down if this router started them.
+        """
+        for reader in self.readers:
+            reader.cancel()
+        for channel in self.channels:
+            channel.close()
+        stop_shards(self.processes, self.controls)
+        self.channels, self.processes, self.controls = [], [], []
+
+
+def run_router(links: list[socket.socket], host: str, port: int):
+    """
+    Runs one of several router processes serving the same port, over its own links to every shard.
+    The process that started the router stops it with SIGTERM.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # the process that started the router stops it
+    redis = ShardedRedis(channels=[Channel(sock) for sock in links])
+
+    async def route():
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        await serve(redis, host, port, reuse_port=True)
+
+    try:
+        asyncio.run(route())
+    except asyncio.CancelledError:
+        pass
+    redis.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quiq Redis, sharded over worker processes')
+    parser.add_argument('--shards', type=int, default=os.cpu_count(), help='worker processes (default: one per core)')
+    parser.add_argument('--routers', type=int, default=1, help='processes serving connections and routing their '
+                                                               'commands to the shards, sharing the port')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=6379, help='TCP port to listen on')
+    for name, value in CONFIG_DEFAULTS.items():
+        parser.add_argument(f'--{name}', dest=name, default=value,
+                            help=f'configuration parameter of every shard (default: {value})')
+    options = parser.parse_args()
+    if options.routers < 1:
+        parser.error('--routers must be at least 1')
+    if options.routers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error('more than one router needs SO_REUSEPORT, which this system does not have')
+
+    try:
+        processes, controls, links = start_shards(options.shards, {name: getattr(options, name)
+                                                                   for name in CONFIG_DEFAULTS}, options.routers)
+    except Exception as e:
+        print(f"Fatal error starting the shards: {e}")
+        sys.exit(1)
+
+    if options.routers == 1:
+        redis = ShardedRedis(channels=links[0])
+        try:
+            asyncio.run(serve(redis, options.host, options.port))
+        except KeyboardInterrupt:
+            pass
+        redis.close()
+    else:
+        context = multiprocessing.get_context()
+        routers: list = [context.Process(target=run_router, name=f'router-{index}',
+                                         args=([channel.sock for channel in channels], options.host, options.port))
+                         for index, channels in enumerate(links)]
+        for router in routers:
+            router.start()
+        for channel in (channel for channels in links for channel in channels):
+            channel.close()
+        try:
+            for router in routers:
+                router.join()
+        except KeyboardInterrupt:
+            for router in routers:
+                router.terminate()
+                router.join(10)
+    stop_shards(processes, controls)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2523 @@
+import argparse, asyncio, fnmatch, heapq, os, random, struct, sys, time, zlib
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from unittest import case
+
+
+ACTIVE_EXPIRE_LOOKUPS: int = 64         # max expiry heap entries examined by one active expiry cycle
+ACTIVE_EXPIRE_BUDGET: float = 0.001     # max seconds spent by one active expiry cycle
+ACTIVE_EXPIRE_CRON_BUDGET: float = 0.025  # max seconds spent by the cycle of cron, a quarter of its interval as in Redis
+CRON_INTERVAL: float = 0.1              # seconds between active expiry cycles when serving
+READ_SIZE: int = 64 * 1024              # max bytes read from a connection at once
+
+
+def parse_int(number: str) -> int:
+    """
+    Parses a Redis integer argument, a signed 64 bit integer in ASCII digits, raising the Redis error for anything else.
+    """
+    digits: str = number[1:] if number[:1] == '-' else number
+    if not (digits.isascii() and digits.isdigit()) or not -2 ** 63 <= int(number) < 2 ** 63:
+        raise Exception('value is not an integer or out of range')
+    return int(number)
+
+
+def lifetime_milliseconds(lifetime: float) -> int:
+    """
+    Returns a lifetime as unix time in milliseconds. Lifetimes are kept as float seconds, which round the largest
+    deadlines accepted up past a signed 64 bit integer, so the result is capped to fit one.
+    """
+    return min(round(lifetime * 1000), 2 ** 63 - 1)
+
+
+class Status(str):
+    """Simple string reply, e.g. OK"""
+
+
+class Error(str):
+    """Error reply, e.g. ERR syntax error"""
+
+
+class Text(str):
+    """Bulk string reply that the CLI displays verbatim, e.g. HELP output"""
+
+
+class ProtocolError(Exception):
+    """Raised when a client sends a request that is not valid RESP"""
+
+
+def render_cli(reply, indent: int = 0) -> str:
+    """
+    param reply: command result, one of Status, Error, Text, int (integer), str (bulk), None (nil) or list (array)
+    param indent: column at which nested array elements are aligned
+
+    Formats a command result the way the Redis CLI displays it, including the trailing line break.
+    """
+    if reply is None:
+        return '(nil)\n'
+    if isinstance(reply, Error):
+        return f'(error) {reply}\n'
+    if isinstance(reply, Status):
+        return f'{reply}\n'
+    if isinstance(reply, Text):
+        return f'{reply}\n' if len(reply) > 0 else ''
+    if isinstance(reply, str):
+        return f'"{reply}"\n'
+    if isinstance(reply, int):
+        return f'(integer) {reply}\n'
+    if len(reply) == 0:
+        return '(empty array)\n'
+    result: list[str] = []
+    for i, element in enumerate(reply):
+        prefix: str = f'{i + 1}) '
+        result.append((' ' * indent if i > 0 else '') + prefix + render_cli(element, indent + len(prefix)))
+    return ''.join(result)
+
+
+def encode_resp(reply, out: bytearray):
+    """
+    param reply: command result, as for render_cli
+    param out: buffer the RESP2 encoding of reply is appended to
+    """
+    kind = type(reply)
+    if kind is str or kind is Text:
+        data: bytes = reply.encode('utf-8', 'surrogateescape')
+        out += b'$%d\r\n%b\r\n' % (len(data), data)
+    elif kind is int:
+        out += b':%d\r\n' % reply
+    elif reply is None:
+        out += b'$-1\r\n'
+    elif kind is Status:
+        out += b'+%b\r\n' % reply.encode()
+    elif kind is Error:
+        out += b'-%b\r\n' % reply.encode('utf-8', 'surrogateescape').replace(b'\r\n', b' ')
+    else:
+        out += b'*%d\r\n' % len(reply)
+        for element in reply:
+            encode_resp(element, out)
+
+
+class RespParser:
+    """
+    Incremental RESP2 request parser. Bytes are fed as they arrive from a stream, complete commands are returned
+    as argument lists and a partially received command is kept until the rest of it arrives.
+    Inline commands (space separated lines, as typed into telnet) are also accepted.
+    Once a request is not valid RESP, error is set and nothing more is parsed.
+    """
+    MAX_ARGS: int = 1024 * 1024             # max number of arguments in one command
+    MAX_BULK: int = 512 * 1024 * 1024       # max length of one argument
+
+    def __init__(self):
+        self.buffer: bytearray = bytearray()
+        self.args: list[str] = []           # arguments received so far for a partial command
+        self.remaining: int = 0             # arguments still expected for a partial command
+        self.error: ProtocolError = None    # set once the stream holds an invalid request
+
+    def feed(self, data: bytes) -> list[list[str]]:
+        """
+        param data: bytes read from the stream
+
+        Returns the commands completed by data, in the order they were sent,
+        up to the first invalid request if there is one.
+        """
+        commands: list[list[str]] = []
+        if self.error is not None:
+            return commands
+        buffer: bytearray = self.buffer
+        buffer += data
+        try:
+            self.parse(buffer, commands)
+        except ProtocolError as e:
+            self.error = e
+        return commands
+
+    def parse(self, buffer: bytearray, commands: list[list[str]]):
+        """
+        Moves every complete command at the start of buffer into commands.
+        """
+        pos: int = 0
+        while pos < len(buffer):
+            if self.remaining == 0:                         # start of a new command
+                end: int = buffer.find(b'\n', pos)
+                if end < 0:
+                    break
+                if buffer[pos] != 0x2a:                     # not '*', so an inline command
+                    line: list[str] = buffer[pos:end].decode('utf-8', 'surrogateescape').split()
+                    pos = end + 1
+                    if len(line) > 0:
+                        commands.append(line)
+                    continue
+                count: int = self.header(buffer, pos, end, self.MAX_ARGS, 'multibulk')
+                pos = end + 1
+                if count > 0:
+                    self.remaining = count
+                continue
+            if buffer[pos] != 0x24:                         # not '$'
+                raise ProtocolError(f"expected '$', got '{chr(buffer[pos])}'")
+            end: int = buffer.find(b'\n', pos)
+            if end < 0:
+                break
+            length: int = self.header(buffer, pos, end, self.MAX_BULK, 'bulk')
+            if end + 1 + length + 2 > len(buffer):         # bulk not fully received yet
+                break
+            self.args.append(buffer[end + 1:end + 1 + length].decode('utf-8', 'surrogateescape'))
+            pos = end + 1 + length + 2
+            self.remaining -= 1
+            if self.remaining == 0:
+                commands.append(self.args)
+                self.args = []
+        del buffer[:pos]
+
+    @staticmethod
+    def header(buffer: bytearray, pos: int, end: int, limit: int, kind: str) -> int:
+        """
+        Parses the length in a '*<count>' or '$<length>' line.
+        """
+        try:
+            length: int = int(buffer[pos + 1:end])
+        except ValueError:
+            raise ProtocolError(f'invalid {kind} length')
+        if length > limit or (length < 0 and kind == 'bulk'):
+            raise ProtocolError(f'invalid {kind} length')
+        return length
+
+
+ENTRY = struct.Struct('<H')
+
+
+def pack_entry(text: str) -> bytes:
+    """
+    Encodes one pack entry: the UTF-8 length, the UTF-8 bytes and the length again.
+    """
+    data: bytes = text.encode('utf-8', 'surrogateescape')
+    size: bytes = ENTRY.pack(len(data))
+    return size + data + size
+
+
+def compact_string(value: str):
+    """
+    Returns value as an int if it is the canonical text of a 64 bit integer, which takes less memory, else value.
+    """
+    if 0 < len(value) < 21 and value.isascii() and (value.isdigit() or value[0] == '-' and value[1:].isdigit()):
+        number: int = int(value)
+        if -2 ** 63 <= number < 2 ** 63 and str(number) == value:
+            return number
+    return value
+
+
+class Pack:
+    """
+    Compact encoding shared by small lists and hashes, like the Redis listpack. All entries are packed into one
+    bytes buffer, each as its length, its UTF-8 bytes and its length again, so that entries can be read from
+    either end. A pack costs two objects instead of a container plus one object per entry. Updates copy the
+    buffer, which is cheap while the pack is small.
+    """
+    __slots__ = ('buf', 'count')
+
+    def __init__(self, entries=()):
+        """
+        param entries: iterable of strings to pack, in order
+        """
+        packed: list[bytes] = [pack_entry(entry) for entry in entries]
+        self.buf: bytes = b''.join(packed)
+        self.count: int = len(packed)               # number of entries
+
+    def __iter__(self):
+        buf: bytes = self.buf
+        pos: int = 0
+        while pos < len(buf):
+            size: int = ENTRY.unpack_from(buf, pos)[0]
+            yield buf[pos + 2:pos + 2 + size].decode('utf-8', 'surrogateescape')
+            pos += size + 4
+
+    def __reversed__(self):
+        buf: bytes = self.buf
+        end: int = len(buf)
+        while end > 0:
+            size: int = ENTRY.unpack_from(buf, end - 2)[0]
+            yield buf[end - 2 - size:end - 2].decode('utf-8', 'surrogateescape')
+            end -= size + 4
+
+    def copy(self):
+        pack = type(self)()
+        pack.buf, pack.count = self.buf, self.count
+        return pack
+
+
+class ListPack(Pack):
+    """
+    Small list, with the deque methods the list commands use.
+    """
+    __slots__ = ()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError
+        if index < self.count // 2:
+            return next(islice(iter(self), index, None))
+        return next(islice(reversed(self), self.count - 1 - index, None))
+
+    def append(self, element: str):
+        self.buf += pack_entry(element)
+        self.count += 1
+
+    def appendleft(self, element: str):
+        self.buf = pack_entry(element) + self.buf
+        self.count += 1
+
+    def extend(self, elements: list[str]):
+        self.buf += b''.join([pack_entry(element) for element in elements])
+        self.count += len(elements)
+
+    def extendleft(self, elements: list[str]):
+        self.buf = b''.join([pack_entry(element) for element in reversed(elements)]) + self.buf
+        self.count += len(elements)
+
+    def popleft(self) -> str:
+        if self.count == 0:
+            raise IndexError
+        size: int = ENTRY.unpack_from(self.buf, 0)[0]
+        element: bytes = self.buf[2:2 + size]
+        self.buf = self.buf[size + 4:]
+        self.count -= 1
+        return element.decode('utf-8', 'surrogateescape')
+
+    def pop(self) -> str:
+        if self.count == 0:
+            raise IndexError
+        end: int = len(self.buf)
+        size: int = ENTRY.unpack_from(self.buf, end - 2)[0]
+        element: bytes = self.buf[end - 2 - size:end - 2]
+        self.buf = self.buf[:end - 4 - size]
+        self.count -= 1
+        return element.decode('utf-8', 'surrogateescape')
+
+
+class HashPack(Pack):
+    """
+    Small hash, packed as alternating field and value entries, with the dict methods the hash commands use.
+    Fields are found by a linear scan, which costs far more per entry in Python than in C, so the scan is
+    skipped when the field's encoding is nowhere in the buffer and hashes are converted at a lower size than in Redis.
+    """
+    __slots__ = ()
+
+    def __len__(self) -> int:
+        return self.count // 2
+
+    def find(self, field: str) -> int:
+        """
+        Returns the offset of the value entry for field, or -1 if field is not in the hash.
+        """
+        target: bytes = pack_entry(field)
+        buf: bytes = self.buf
+        if target not in buf:                                   # a miss without walking the entries
+            return -1
+        pos: int = 0
+        while pos < len(buf):
+            if buf.startswith(target, pos):
+                return pos + len(target)
+            pos += ENTRY.unpack_from(buf, pos)[0] + 4           # skip field
+            pos += ENTRY.unpack_from(buf, pos)[0] + 4           # skip value
+        return -1
+
+    def get(self, field: str, default=None):
+        pos: int = self.find(field)
+        if pos < 0:
+            return default
+        size: int = ENTRY.unpack_from(self.buf, pos)[0]
+        return self.buf[pos + 2:pos + 2 + size].decode('utf-8', 'surrogateescape')
+
+    def __contains__(self, field: str) -> bool:
+        return self.find(field) >= 0
+
+    def __setitem__(self, field: str, value: str):
+        pos: int = self.find(field)
+        if pos < 0:
+            self.buf += pack_entry(field) + pack_entry(value)
+            self.count += 2
+        else:
+            end: int = pos + ENTRY.unpack_from(self.buf, pos)[0] + 4
+            self.buf = self.buf[:pos] + pack_entry(value) + self.buf[end:]
+
+    def items(self):
+        entries = iter(self)
+        return zip(entries, entries)
+
+
+STRING_TYPES: tuple = (str, int)                # encodings of strings: text, or 64 bit integers
+LIST_TYPES: tuple = (ListPack, deque)           # encodings of lists: small, or any size
+HASH_TYPES: tuple = (HashPack, dict)            # encodings of hashes: small, or any size
+
+
+def value_size(value, samples: int) -> int:
+    """
+    param value: value stored at a key
+    param samples: number of elements of a list or hash measured to estimate the rest, 0 to measure all
+
+    Returns an estimate of the bytes of memory used by value.
+    """
+    size: int = sys.getsizeof(value)
+    if isinstance(value, Pack):
+        return size + sys.getsizeof(value.buf)
+    if isinstance(value, STRING_TYPES) or len(value) == 0:
+        return size
+    sampled = list(islice(value.items() if isinstance(value, dict) else value, samples or None))
+    measured: int = sum(sys.getsizeof(element) if isinstance(element, str)
+                        else sys.getsizeof(element[0]) + sys.getsizeof(element[1]) for element in sampled)
+    return size + measured * len(value) // len(sampled)
+
+
+SNAPSHOT_MAGIC: bytes = b'QDB\x01'      # snapshot file signature and format version
+SNAPSHOT_STRING: int = 0                # record holding a string value
+SNAPSHOT_LIST: int = 1                  # record holding a list value
+SNAPSHOT_HASH: int = 2                  # record holding a hash value
+SNAPSHOT_LIFETIME: int = 0xFC           # lifetime of the next record, in unix time milliseconds
+SNAPSHOT_EOF: int = 0xFF                # end of records, followed by the CRC32 of the file so far
+SNAPSHOT_CHUNK: int = 1024 * 1024       # bytes buffered when writing or reading a snapshot
+REWRITE_ITEMS_PER_COMMAND: int = 64     # max list or hash items per command written by an append only file rewrite
+
+LENGTH = struct.Struct('<I')
+LIFETIME = struct.Struct('<q')
+
+CONFIG_DEFAULTS: dict[str,str] = {      # configuration parameters, as read and written by CONFIG
+    'dir': '.',                         # directory holding the snapshot and append only files
+    'dbfilename': 'dump.qdb',           # snapshot file name
+    'appendonly': 'no',                 # yes to log every write command to the append only file
+    'appendfilename': 'appendonly.aof', # append only file name
+    'appendfsync': 'everysec',          # always, everysec or no: how often the append only file is flushed to disk
+    'hash-max-listpack-entries': '16',  # max fields of a hash in the compact encoding
+    'hash-max-listpack-value': '64',    # max length of a field or value of a hash in the compact encoding
+    'list-max-listpack-size': '128',    # max elements of a list in the compact encoding
+    'list-max-listpack-value': '64',    # max length of an element of a list in the compact encoding
+    'slowlog-log-slower-than': '10000', # microseconds a command must take to be logged, negative to log none
+    'slowlog-max-len': '128',           # max entries kept in the slow log
+    'maxmemory': '0',                   # max bytes used by the data set, e.g. 100mb, 0 for no limit
+    'maxmemory-policy': 'noeviction',   # keys evicted once maxmemory is reached, see MAXMEMORY_POLICIES
+    'maxmemory-samples': '5',           # keys sampled to choose each key to evict
+}
+MAX_PACK_VALUE: int = 16383             # largest *-max-listpack-value, so that any entry length fits in 2 bytes
+
+WRITE_COMMANDS: set[str] = {            # commands logged to the append only file
+    'SET', 'DEL', 'LPUSH', 'LPOP', 'RPUSH', 'RPOP', 'LTRIM', 'HSET', 'EXPIRE', 'PEXPIREAT', 'PERSIST'
+}
+KEY_SPECS: dict[str,tuple[int,int]] = { # commands taking keys: index of the first key in the arguments, and of the
+    'GET': (0, 0), 'SET': (0, 0),       # last key, -1 if every argument from the first key on is a key
+    'MGET': (0, -1), 'DEL': (0, -1),
+    'LPUSH': (0, 0), 'LPOP': (0, 0), 'RPUSH': (0, 0), 'RPOP': (0, 0),
+    'LRANGE': (0, 0), 'LLEN': (0, 0), 'LINDEX': (0, 0), 'LTRIM': (0, 0),
+    'HSET': (0, 0), 'HGET': (0, 0),
+    'EXPIRE': (0, 0), 'PEXPIREAT': (0, 0), 'PERSIST': (0, 0), 'TTL': (0, 0), 'PTTL': (0, 0),
+    'OBJECT': (1, 1), 'MEMORY': (1, 1),
+}
+
+
+def command_keys(name: str, args: list[str]) -> list[str]:
+    """
+    param name: upper case Redis command string
+    param args: Arguments of the command
+
+    Returns the keys a command accesses, empty for commands that take no keys or are missing their key.
+    """
+    spec: tuple[int,int] = KEY_SPECS.get(name)
+    if spec is None:
+        return []
+    first, last = spec
+    return args[first:] if last < 0 else args[first:last + 1]
+
+
+def write_snapshot(path: str, items):
+    """
+    param path: snapshot file to write
+    param items: iterable of (key, value, lifetime) for every key, lifetime being None for keys without one
+
+    Writes the keys to path in the snapshot format. The file is written under a temporary name and renamed
+    once complete, so path always holds a whole snapshot.
+    """
+    temp: str = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as file:
+        out = bytearray(SNAPSHOT_MAGIC)
+        crc: int = 0
+
+        def put(text: str):
+            data: bytes = text.encode('utf-8', 'surrogateescape')
+            out.extend(LENGTH.pack(len(data)))
+            out.extend(data)
+
+        for key, value, lifetime in items:
+            if lifetime is not None:
+                out.append(SNAPSHOT_LIFETIME)
+                out.extend(LIFETIME.pack(lifetime_milliseconds(lifetime)))
+            if isinstance(value, STRING_TYPES):
+                out.append(SNAPSHOT_STRING)
+                put(key)
+                put(str(value))
+            elif isinstance(value, LIST_TYPES):
+                out.append(SNAPSHOT_LIST)
+                put(key)
+                out.extend(LENGTH.pack(len(value)))
+                for element in value:
+                    put(element)
+            else:
+                out.append(SNAPSHOT_HASH)
+                put(key)
+                out.extend(LENGTH.pack(len(value)))
+                for field, element in value.items():
+                    put(field)
+                    put(element)
+            if len(out) >= SNAPSHOT_CHUNK:
+                crc = zlib.crc32(out, crc)
+                file.write(out)
+                out.clear()
+        out.append(SNAPSHOT_EOF)
+        out.extend(LENGTH.pack(zlib.crc32(out, crc)))
+        file.write(out)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+
+def read_snapshot(path: str):
+    """
+    param path: snapshot file to read
+
+    Streams the keys stored in a snapshot, yielding (key, value, lifetime) for each.
+    Keys whose lifetime has already passed are skipped. Raises an Exception if the file is damaged.
+    """
+    now: float = time.time()
+    unpack_length = LENGTH.unpack_from
+    with open(path, 'rb', buffering=0) as file:
+        buffer: bytes = b''
+        pos: int = 0
+        crc: int = 0
+
+        def fill(size: int):                        # ensures size bytes are available at pos
+            nonlocal buffer, pos, crc
+            if pos + size <= len(buffer):
+                return
+            crc = zlib.crc32(memoryview(buffer)[:pos], crc)
+            chunks: list[bytes] = [buffer[pos:]]
+            available: int = len(buffer) - pos
+            while available < size:
+                chunk: bytes = file.read(max(size - available, SNAPSHOT_CHUNK))
+                if len(chunk) == 0:
+                    break
+                chunks.append(chunk)
+                available += len(chunk)
+            buffer = b''.join(chunks)
+            pos = 0
+            if len(buffer) < size:
+                raise Exception('Short read or OOM loading DB. Unrecoverable error, aborting now.')
+
+        def take(size: int) -> bytes:
+            nonlocal pos
+            fill(size)
+            pos += size
+            return buffer[pos - size:pos]
+
+        def length() -> int:
+            nonlocal pos
+            fill(4)
+            pos += 4
+            return unpack_length(buffer, pos - 4)[0]
+
+        def text() -> str:
+            nonlocal pos
+            if pos + 4 > len(buffer):
+                fill(4)
+            size: int = unpack_length(buffer, pos)[0]
+            if pos + 4 + size > len(buffer):
+                fill(4 + size)
+            pos += 4 + size
+            return buffer[pos - size:pos].decode('utf-8', 'surrogateescape')
+
+        if take(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise Exception('Wrong signature trying to load DB from file')
+        lifetime: float = None
+        while True:
+            if pos >= len(buffer):
+                fill(1)
+            kind: int = buffer[pos]
+            pos += 1
+            if kind == SNAPSHOT_EOF:
+                expected: int = zlib.crc32(memoryview(buffer)[:pos], crc)
+                if length() != expected:
+                    raise Exception('Wrong RDB checksum. Aborting now.')
+                return
+            if kind == SNAPSHOT_LIFETIME:
+                fill(8)
+                pos += 8
+                lifetime = LIFETIME.unpack_from(buffer, pos - 8)[0] / 1000
+                continue
+            key: str = text()
+            if kind == SNAPSHOT_STRING:
+                value = text()
+            elif kind == SNAPSHOT_LIST:
+                value = deque([text() for _ in range(length())])
+            elif kind == SNAPSHOT_HASH:
+                value = {}
+                for _ in range(length()):
+                    field: str = text()
+                    value[field] = text()
+            else:
+                raise Exception(f'Unknown record type {kind} loading DB')
+            if lifetime is None or lifetime > now:
+                yield key, value, lifetime
+            lifetime = None
+
+
+def write_rewrite(path: str, items):
+    """
+    param path: append only file to write
+    param items: iterable of (key, value, lifetime), as for write_snapshot
+
+    Writes the shortest sequence of commands that rebuilds the keys, to replace the log of every write made so far.
+    """
+    with open(path, 'wb') as file:
+        out = bytearray()
+        for key, value, lifetime in items:
+            if isinstance(value, STRING_TYPES):
+                encode_resp(['SET', key, str(value)], out)
+            elif isinstance(value, LIST_TYPES):
+                elements: list[str] = list(value)
+                for i in range(0, len(elements), REWRITE_ITEMS_PER_COMMAND):
+                    encode_resp(['RPUSH', key, *elements[i:i + REWRITE_ITEMS_PER_COMMAND]], out)
+            else:
+                pairs: list[str] = [text for pair in value.items() for text in pair]
+                for i in range(0, len(pairs), 2 * REWRITE_ITEMS_PER_COMMAND):
+                    encode_resp(['HSET', key, *pairs[i:i + 2 * REWRITE_ITEMS_PER_COMMAND]], out)
+            if lifetime is not None:
+                encode_resp(['PEXPIREAT', key, str(lifetime_milliseconds(lifetime))], out)
+            if len(out) >= SNAPSHOT_CHUNK:
+                file.write(out)
+                out.clear()
+        file.write(out)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class AppendOnlyFile:
+    """
+    Log of the write commands executed, replayed at startup to rebuild the data set.
+    Commands are buffered while a batch runs and written once it completes.
+    """
+    def __init__(self, path: str, fsync: str):
+        """
+        param path: append only file
+        param fsync: always, everysec or no
+        """
+        self.path: str = path
+        self.fsync: str = fsync
+        self.file = open(path, 'ab')
+        self.buffer: bytearray = bytearray()        # commands not written yet
+        self.rewrite: bytearray = None              # commands since a background rewrite started, if one is running
+        self.synced: float = time.monotonic()       # when the file was last flushed to disk
+
+    def feed(self, args: list[str]):
+        """
+        Appends a command to the log.
+        """
+        size: int = len(self.buffer)
+        encode_resp(args, self.buffer)
+        if self.rewrite is not None:
+            self.rewrite += memoryview(self.buffer)[size:]
+
+    def flush(self):
+        """
+        Writes buffered commands to the file, flushing it to disk when fsync is always.
+        """
+        if len(self.buffer) == 0:
+            return
+        self.file.write(self.buffer)
+        self.file.flush()
+        self.buffer.clear()
+        if self.fsync == 'always':
+            os.fsync(self.file.fileno())
+
+    def sync(self):
+        """
+        Flushes the file to disk when fsync is everysec and a second has passed since it last was.
+        """
+        if self.fsync == 'everysec' and time.monotonic() - self.synced >= 1.:
+            self.flush()
+            os.fsync(self.file.fileno())
+            self.synced = time.monotonic()
+
+    def reopen(self):
+        """
+        Switches to a file just renamed onto path, as after a rewrite.
+        """
+        self.file.close()
+        self.file = open(self.path, 'ab')
+
+    def close(self):
+        """
+        Writes buffered commands and flushes the file to disk before closing it.
+        """
+        self.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+
+SLOWLOG_MAX_ARGS: int = 32              # max arguments of a command kept in a slow log entry
+SLOWLOG_MAX_ARG_LEN: int = 128          # max characters of an argument kept in a slow log entry
+HISTOGRAM_BUCKETS: int = 64             # latency histogram buckets, bucket i counting durations below 2 ** i microseconds
+INFO_SECTIONS: list[str] = [            # sections of INFO, in order
+    'server', 'clients', 'memory', 'persistence', 'stats', 'commandstats', 'errorstats', 'keyspace'
+]
+INFO_MEMORY_SAMPLES: int = 64           # keys measured to estimate the memory used by the data set
+
+
+def resident_memory() -> int:
+    """
+    Returns the bytes of memory resident for the process, or 0 where the operating system does not report it.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+MAXMEMORY_POLICIES: tuple = (           # values of maxmemory-policy
+    'noeviction',                       # evict nothing, refuse commands that allocate memory
+    'allkeys-lru', 'allkeys-lfu', 'allkeys-random',     # evict the least recently used, least frequently used,
+    'volatile-lru', 'volatile-lfu', 'volatile-random',  # or a random key, of all keys or of the keys with a lifetime
+    'volatile-ttl',                     # evict the key with a lifetime that expires first
+)
+MEMORY_UNITS: dict[str,int] = {         # units of memory sizes in the configuration
+    '': 1, 'b': 1, 'k': 1000, 'kb': 1024, 'm': 1000 ** 2, 'mb': 1024 ** 2, 'g': 1000 ** 3, 'gb': 1024 ** 3
+}
+DENY_OOM_COMMANDS: set[str] = {         # write commands that may allocate memory, refused when out of memory
+    'SET', 'LPUSH', 'RPUSH', 'HSET'
+}
+MEMORY_USAGE_SAMPLES: int = 5           # elements of a large list or hash measured to estimate the memory it uses
+LRU_CLOCK_MAX: int = 0xFFFFFFFF         # LRU clock, in milliseconds, wraps around after about 49 days
+LFU_INIT_VAL: int = 5                   # LFU counter of a new key, so it is not evicted before it can be accessed
+LFU_LOG_FACTOR: int = 10                # higher values need more accesses to increment the LFU counter
+LFU_DECAY_MINUTES: int = 1              # minutes without access that decrement the LFU counter by one
+
+
+class OutOfMemory(Exception):
+    """Raised when a command may allocate memory, used memory is above maxmemory and no key can be evicted"""
+
+
+def parse_memory(text: str) -> int:
+    """
+    Returns the bytes of a memory size such as 100mb (units k, kb, m, mb, g and gb), or None if text is not one.
+    """
+    text = text.lower()
+    end: int = len(text)
+    while end > 0 and not text[end - 1].isdigit():
+        end -= 1
+    if end == 0 or not (text[:end].isascii() and text[:end].isdigit()) or text[end:] not in MEMORY_UNITS:
+        return None
+    return int(text[:end]) * MEMORY_UNITS[text[end:]]
+
+
+def lru_clock() -> int:
+    """
+    Returns the current time of the LRU clock.
+    """
+    return int(time.monotonic() * 1000) & LRU_CLOCK_MAX
+
+
+def lfu_counter(access: int) -> int:
+    """
+    param access: LFU access metadata of a key: minutes of its last access << 8 | log counter
+
+    Returns the log counter of the key, decremented by one for every LFU_DECAY_MINUTES since its last access.
+    """
+    elapsed: int = (int(time.monotonic() // 60) - (access >> 8)) & 0xFFFFFF
+    return max((access & 0xFF) - elapsed // LFU_DECAY_MINUTES, 0)
+
+
+def lfu_access(access: int) -> int:
+    """
+    Returns the LFU access metadata of a key after one more access. The log counter is incremented with a
+    probability that falls as it grows, so 8 bits count about a million accesses.
+    """
+    counter: int = lfu_counter(access)
+    if counter < 255 and random.random() * ((counter - LFU_INIT_VAL) * LFU_LOG_FACTOR + 1) < 1:
+        counter += 1
+    return (int(time.monotonic() // 60) & 0xFFFFFF) << 8 | counter
+
+
+class Client:
+    """State kept for each connection to the database"""
+    def __init__(self, address: str = ''):
+        self.address: str = address                 # host:port of the connection, empty for the CLI
+        self.transaction: list[list[str]] = None    # commands queued since MULTI, None outside a transaction
+        self.dirty: bool = False                    # a command failed to queue, so EXEC must abort
+
+
+class CommandStats:
+    """Counters kept for each command by Redis.call"""
+    __slots__ = ('calls', 'microseconds', 'max', 'errors', 'histogram')
+
+    def __init__(self):
+        self.calls: int = 0                         # times the command was executed
+        self.microseconds: int = 0                  # total execution time
+        self.max: int = 0                           # longest execution time
+        self.errors: dict[str,int] = {}             # failed calls by kind: syntax, wrongtype, arity, range or other
+        self.histogram: list[int] = [0] * HISTOGRAM_BUCKETS
+
+
+class Redis:
+    """Redis Class"""
+    def __init__(self, config: dict[str,str] = None):
+        """
+        Redis Class Constructor
+
+        param config: configuration parameters overriding CONFIG_DEFAULTS
+        """
+        self.active: bool = True        # active indicates the program should continue
+        self.data: dict[str,any] = {}            # stores Redis key values
+        self.lifetimes: dict[str,float] = {}     # stores Redis key lifetimes (absolute unix time)
+        self.expiry: list[tuple[float,str]] = [] # min-heap of (lifetime, key), may hold stale entries
+        self.client: Client = Client()           # connection the current command was sent on
+        self.config: dict[str,str] = {**CONFIG_DEFAULTS, **(config or {})}
+        self.aof: AppendOnlyFile = None          # open while appendonly is yes
+        self.set_written: bool = False           # the last SET wrote its key, rather than being aborted by NX or XX
+        self.child: tuple[str,any] = None        # running background 'save' or 'rewrite' and its pid or future
+        self.last_save: float = time.time()      # when the snapshot was last written successfully
+        self.hash_max_entries: int = 0           # limits of the compact encodings, set from config by configure()
+        self.hash_max_value: int = 0
+        self.list_max_entries: int = 0
+        self.list_max_value: int = 0
+        self.slowlog_threshold: int = 0          # slowlog-log-slower-than, set from config by configure()
+        self.slowlog: deque = deque(maxlen=0)    # newest first: (id, unix time, microseconds, args, client address)
+        self.slowlog_ids: int = 0                # id of the next slow log entry
+        self.command_stats: dict[str,CommandStats] = {}     # upper case command string to its counters
+        self.error_stats: dict[str,int] = {}     # error replies by error code, e.g. ERR or WRONGTYPE
+        self.expired_keys: int = 0               # keys removed because their lifetime passed
+        self.expire_cycle_seconds: float = 0.    # time spent in active expiry cycles
+        self.started: float = time.time()
+        self.connected_clients: int = 0          # open server connections
+        self.total_connections: int = 0          # server connections accepted
+        self.maxmemory: int = 0                  # maxmemory in bytes, 0 for no limit, set from config by configure()
+        self.maxmemory_policy: str = 'noeviction'
+        self.maxmemory_samples: int = 0
+        self.used_memory: int = 0                # bytes used by keys and values, tracked while maxmemory is set
+        self.key_list: list[str] = []            # keys tracked while maxmemory is set, in no order, for sampling
+        self.key_positions: dict[str,int] = {}   # tracked key to its position in key_list and key_access
+        self.key_access: array = array('I')      # per tracked key: LRU clock or LFU minutes << 8 | log counter
+        self.evicted_keys: int = 0               # keys removed to keep used memory within maxmemory
+        self.configure()
+        self.commands: dict[str,callable] = {    # maps command string to command function
+                'HELP':   self.redis_help,
+                'SET':    self.redis_set,
+                'GET':    self.redis_get,
+                'MGET':   self.redis_mget,
+                'DEL':    self.redis_delete,
+                'LPUSH':  self.redis_left_push,
+                'LPOP':   self.redis_left_pop,
+                'RPUSH':  self.redis_right_push,
+                'RPOP':   self.redis_right_pop,
+                'LRANGE': self.redis_range,
+                'LLEN':   self.redis_list_length,
+                'LINDEX': self.redis_list_index,
+                'LTRIM':  self.redis_list_trim,
+                'HSET':   self.redis_hash_set,
+                'HGET':   self.redis_hash_get,
+                'EXPIRE':  self.redis_expire,
+                'PERSIST': self.redis_persist,
+                'TTL':     self.redis_ttl,
+                'PTTL':    self.redis_pttl,
+                'MULTI':   self.redis_multi,
+                'EXEC':    self.redis_exec,
+                'DISCARD': self.redis_discard,
+                'PEXPIREAT':    self.redis_pexpireat,
+                'SAVE':         self.redis_save,
+                'BGSAVE':       self.redis_bgsave,
+                'BGREWRITEAOF': self.redis_bgrewriteaof,
+                'CONFIG':       self.redis_config,
+                'OBJECT':       self.redis_object,
+                'MEMORY':       self.redis_memory,
+                'INFO':         self.redis_info,
+                'SLOWLOG':      self.redis_slowlog,
+                'LATENCY':      self.redis_latency,
+                'QUIT':    self.redis_quit
+        }
+
+    def clean(self, lookups: int = ACTIVE_EXPIRE_LOOKUPS, budget: float = ACTIVE_EXPIRE_BUDGET):
+        """
+        param lookups: max expiry heap entries examined
+        param budget: max seconds spent
+
+        Active expiry cycle. Removes keys beyond expiration time from data set and lifetimes set,
+        earliest lifetime first, stopping after lookups heap entries or budget seconds. Before each command
+        or batch the defaults keep the cost flat however many keys have lifetimes; cron() runs until its larger
+        budget is spent, as every expired heap entry popped is a key to remove.
+        Keys left behind are still removed lazily by lookup() when they are accessed.
+        """
+        heap: list[tuple[float,str]] = self.expiry
+        if not heap or heap[0][0] >= time.time():               # earliest lifetime has not expired
+            return
+        now: float = time.time()
+        started: float = time.perf_counter()
+        deadline: float = started + budget
+        for _ in range(lookups):
+            if not heap or heap[0][0] >= now:
+                break
+            lifetime, key = heapq.heappop(heap)
+            if self.lifetimes.get(key) == lifetime:             # skip entries replaced or removed since
+                self.expire_key(key)
+            if time.perf_counter() > deadline:
+                break
+        self.expire_cycle_seconds += time.perf_counter() - started
+
+    def set_lifetime(self, key: str, lifetime: float):
+        """
+        param key: key holding a value
+        param lifetime: absolute unix time at which the key expires
+
+        Sets the lifetime of key and schedules it in the expiry heap. Superseded heap entries are left in place
+        and skipped by clean(); the heap is rebuilt once they outnumber the live lifetimes.
+        """
+        self.lifetimes[key] = lifetime
+        heapq.heappush(self.expiry, (lifetime, key))
+        if len(self.expiry) > 2 * len(self.lifetimes) + 64:
+            self.expiry = [(lifetime, key) for key, lifetime in self.lifetimes.items()]
+            heapq.heapify(self.expiry)
+
+    def expire_key(self, key: str):
+        """
+        Removes a key beyond expiration time, logging the removal to the append only file.
+        """
+        self.drop_key(key)
+        self.expired_keys += 1
+
+    def drop_key(self, key: str):
+        """
+        Removes a key expired or evicted outside of the commands that access it: stops tracking its memory
+        and logs the removal to the append only file.
+        """
+        if self.maxmemory > 0:
+            self.used_memory -= self.key_size(key)
+            self.untrack(key)
+        self.delete_key(key)
+        if self.aof is not None:
+            self.aof.feed(['DEL', key])
+
+    def delete_key(self, key: str) -> bool:
+        """
+        Removes key from data set and lifetimes set. Returns True if the key held a value.
+        """
+        self.lifetimes.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def lookup(self, key: str):
+        """
+        Returns the value stored at key, or None if the key does not exist.
+        A key beyond expiration time is removed first (lazy expiry).
+        """
+        lifetime = self.lifetimes.get(key)
+        if lifetime is not None and time.time() > lifetime:
+            self.expire_key(key)
+            return None
+        return self.data.get(key)
+
+    def execute_command(self, com: str, args: list[str]):
+        """
+        param com: Redis command string
+        param args: Arguments for command function
+
+        Executes appropriate command function with args list and prints the result as the Redis CLI does
+        """
+        print(render_cli(self.dispatch(com, args)), end='')
+
+    def dispatch(self, com: str, args: list[str]):
+        """
+        param com: Redis command string
+        param args: Arguments for command function
+
+        Executes appropriate command function with args list and returns its result,
+        or an Error reply if the command failed
+        """
+        name: str = com.upper()
+        result = self.call(com, name, self.commands.get(name), args)
+        if self.aof is not None:
+            self.aof.flush()
+        return result
+
+    def execute_batch(self, commands: list[list[str]]) -> list:
+        """
+        param commands: list of commands, each a list of the command string followed by its arguments
+
+        Executes the commands in order and returns the list of their results, as dispatch would.
+        Expired keys are cleaned once for the whole batch and each distinct command string is looked up once,
+        so a batch avoids the per command overhead of calling dispatch repeatedly.
+        """
+        self.clean()
+        resolved: dict[str,tuple[str,callable]] = {}    # command string to name and command function
+        results: list = []
+        for com, *args in commands:
+            found: tuple[str,callable] = resolved.get(com)
+            if found is None:
+                found = resolved[com] = (com.upper(), self.commands.get(com.upper()))
+            results.append(self.call(com, found[0], found[1], args))
+        if self.aof is not None:
+            self.aof.flush()
+        return results
+
+    def call(self, com: str, name: str, command: callable, args: list[str]):
+        """
+        param com: Redis command string
+        param name: com in upper case
+        param command: command function for com, None if there is none
+        param args: Arguments for command function
+
+        Executes command with args list, or queues it if the current client is in a transaction.
+        Records the execution time and outcome in the command statistics, and logs slow commands to the slow log.
+        """
+        transaction: list[list[str]] = self.client.transaction
+        if transaction is not None and name not in ('MULTI', 'EXEC', 'DISCARD', 'QUIT'):
+            if command is None:
+                self.client.dirty = True
+            else:
+                transaction.append([com, *args])
+                return Status('QUEUED')
+
+        failure: str = None                 # kind of error, for the command statistics
+        started: int = time.perf_counter_ns()
+        try:
+            if command is None:
+                arg_string = "'" + "' '".join(args) + "'" if len(args) > 0 else ''
+                raise NameError(f"unknown command '{com}' with args beginning with: {arg_string}")
+            result = command(args) if self.maxmemory == 0 else self.call_limited(name, command, args)
+            if self.aof is not None:
+                self.propagate(name, args)
+
+        except NameError as e:
+            result = Error(f"ERR {e}")
+        except SyntaxError:
+            result, failure = Error(f"ERR syntax error"), 'syntax'
+        except TypeError:
+            result, failure = Error(f"WRONGTYPE Operation against a key holding the wrong kind of value"), 'wrongtype'
+        except ValueError as e:
+            result, failure = Error(f"ERR wrong number of arguments for '{com}' command"), 'arity'
+        except IndexError:
+            result, failure = Error("ERR value is out of range, must be positive"), 'range'
+        except OutOfMemory:
+            result, failure = Error("OOM command not allowed when used memory > 'maxmemory'."), 'oom'
+        except Exception as e:
+            result, failure = Error(f"ERR {e}"), 'other'
+
+        if command is not None:             # unknown commands are only counted in the error statistics
+            microseconds: int = (time.perf_counter_ns() - started) // 1000
+            stats: CommandStats = self.command_stats.get(name)
+            if stats is None:
+                stats = self.command_stats[name] = CommandStats()
+            stats.calls += 1
+            stats.microseconds += microseconds
+            if microseconds > stats.max:
+                stats.max = microseconds
+            stats.histogram[min(microseconds.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+            if failure is not None:
+                stats.errors[failure] = stats.errors.get(failure, 0) + 1
+            if 0 <= self.slowlog_threshold <= microseconds:
+                self.log_slow(name, args, microseconds)
+        if type(result) is Error:
+            code: str = result.split(' ', 1)[0]
+            self.error_stats[code] = self.error_stats.get(code, 0) + 1
+        return result
+
+    def call_limited(self, name: str, command: callable, args: list[str]):
+        """
+        param name: upper case Redis command string
+        param command: command function for name
+        param args: Arguments for command function
+
+        Executes command while maxmemory is set. Keys are evicted first if the command may allocate memory and
+        used memory is above maxmemory. Used memory is updated with the change in size of the keys a write command
+        touches, and the access time or frequency of every key the command accesses is updated.
+        """
+        keys: list[str] = command_keys(name, args)
+        if name in DENY_OOM_COMMANDS and self.used_memory > self.maxmemory:
+            self.evict()
+        if name not in WRITE_COMMANDS:
+            result = command(args)
+            for key in keys:
+                self.track(key)
+            return result
+
+        if len(keys) == 1:
+            key: str = keys[0]
+            self.lookup(key)                # expires the key first, so its removal is counted once
+            before: int = self.key_size(key)
+            try:
+                return command(args)
+            finally:
+                self.used_memory += self.key_size(key) - before
+                self.track(key)
+
+        keys = list(dict.fromkeys(keys))
+        for key in keys:
+            self.lookup(key)
+        before: int = sum(self.key_size(key) for key in keys)
+        try:
+            return command(args)
+        finally:
+            self.used_memory += sum(self.key_size(key) for key in keys) - before
+            for key in keys:
+                self.track(key)
+
+    def key_size(self, key: str) -> int:
+        """
+        Returns the bytes of memory used by key and its value, as counted in used memory, or 0 if it does not exist.
+        """
+        value = self.data.get(key)
+        if value is None:
+            return 0
+        if type(value) is str or type(value) is int:        # skips the type checks of value_size
+            return sys.getsizeof(key) + sys.getsizeof(value)
+        return sys.getsizeof(key) + value_size(value, MEMORY_USAGE_SAMPLES)
+
+    def new_access(self) -> int:
+        """
+        Returns the access metadata of a key that was just created: the LRU clock, or the initial LFU counter.
+        """
+        if self.maxmemory_policy.endswith('lfu'):
+            return (int(time.monotonic() // 60) & 0xFFFFFF) << 8 | LFU_INIT_VAL
+        return lru_clock()
+
+    def track_keys(self):
+        """
+        Starts tracking every key for maxmemory: measures the memory they use, and gives them all the access
+        metadata of a new key.
+        """
+        self.key_list = list(self.data)
+        self.key_positions = {key: position for position, key in enumerate(self.key_list)}
+        self.key_access = array('I', [self.new_access()]) * len(self.key_list)
+        self.used_memory = sum(self.key_size(key) for key in self.key_list)
+
+    def track(self, key: str):
+        """
+        Updates the access metadata of a key after a command accessed it. Keys created by the command start
+        being tracked, keys removed by it stop being tracked.
+        """
+        position: int = self.key_positions.get(key)
+        if position is None:
+            if key in self.data:
+                self.key_positions[key] = len(self.key_list)
+                self.key_list.append(key)
+                self.key_access.append(self.new_access())
+        elif key not in self.data:
+            self.untrack(key)
+        elif self.maxmemory_policy.endswith('lfu'):
+            self.key_access[position] = lfu_access(self.key_access[position])
+        else:
+            self.key_access[position] = lru_clock()
+
+    def untrack(self, key: str):
+        """
+        Stops tracking a removed key, moving the last tracked key into its place.
+        """
+        position: int = self.key_positions.pop(key, None)
+        if position is None:
+            return
+        last: str = self.key_list.pop()
+        access: int = self.key_access.pop()
+        if position < len(self.key_list):
+            self.key_list[position] = last
+            self.key_access[position] = access
+            self.key_positions[last] = position
+
+    def evict(self):
+        """
+        Evicts keys chosen by maxmemory-policy until used memory is within maxmemory.
+        Raises OutOfMemory if the policy is noeviction or there is no key left that the policy may evict.
+        """
+        while self.used_memory > self.maxmemory:
+            key: str = self.eviction_candidate()
+            if key is None:
+                raise OutOfMemory
+            self.drop_key(key)
+            self.evicted_keys += 1
+
+    def eviction_candidate(self) -> str:
+        """
+        Returns the key to evict next, or None if the policy may evict none. Rather than keeping keys ordered by
+        access, maxmemory-samples keys are sampled at random and the one the policy ranks first is chosen:
+        the longest idle for LRU, the least frequently used for LFU. volatile-ttl takes the earliest lifetime
+        from the expiry heap.
+        """
+        policy: str = self.maxmemory_policy
+        if policy == 'noeviction' or policy.startswith('volatile') and len(self.lifetimes) == 0:
+            return None
+        if policy == 'volatile-ttl':
+            heap: list[tuple[float,str]] = self.expiry
+            while heap and self.lifetimes.get(heap[0][1]) != heap[0][0]:   # drops entries replaced or removed
+                heapq.heappop(heap)
+            return heap[0][1] if heap else None
+
+        candidates: list[str] = []
+        if policy.startswith('allkeys'):
+            if len(self.key_list) == 0:
+                return None
+            candidates = [self.key_list[random.randrange(len(self.key_list))]
+                          for _ in range(self.maxmemory_samples)]
+        while len(candidates) == 0:         # keys with a lifetime, sampled from the expiry heap
+            heap: list[tuple[float,str]] = self.expiry
+            sampled = (heap[random.randrange(len(heap))] for _ in range(self.maxmemory_samples))
+            candidates = [key for lifetime, key in sampled if self.lifetimes.get(key) == lifetime]
+
+        if policy.endswith('random'):
+            return candidates[0]
+        positions: dict[str,int] = self.key_positions
+        if policy.endswith('lfu'):
+            return min(candidates, key=lambda key: lfu_counter(self.key_access[positions[key]]))
+        now: int = lru_clock()
+        return max(candidates, key=lambda key: (now - self.key_access[positions[key]]) & LRU_CLOCK_MAX)
+
+    def log_slow(self, name: str, args: list[str], microseconds: int):
+        """
+        param name: upper case Redis command string
+        param args: Arguments the command was executed with
+        param microseconds: execution time
+
+        Adds the command to the slow log, truncating long argument lists and long arguments.
+        """
+        logged: list[str] = [name, *args][:SLOWLOG_MAX_ARGS]
+        logged = [arg if len(arg) <= SLOWLOG_MAX_ARG_LEN else
+                  f'{arg[:SLOWLOG_MAX_ARG_LEN]}... ({len(arg) - SLOWLOG_MAX_ARG_LEN} more bytes)' for arg in logged]
+        if len(args) + 1 > SLOWLOG_MAX_ARGS:
+            logged[-1] = f'... ({len(args) + 2 - SLOWLOG_MAX_ARGS} more arguments)'
+        self.slowlog.appendleft((self.slowlog_ids, int(time.time()), microseconds, logged, self.client.address))
+        self.slowlog_ids += 1
+
+    def propagate(self, name: str, args: list[str]):
+        """
+        param name: upper case Redis command string
+        param args: Arguments the command was executed with
+
+        Logs a write command to the append only file. Relative lifetimes are logged as the absolute
+        unix time they were set to, so that replaying the file later expires keys at the same time.
+        SET is logged as a plain SET of the value, only if it wrote the key: its NX and XX conditions would be
+        checked against a different data set on replay, once lifetimes logged since have expired keys.
+        """
+        if name not in WRITE_COMMANDS:
+            return
+        if name == 'EXPIRE' or name == 'PEXPIREAT':
+            key: str = args[0]
+            if key in self.lifetimes:
+                self.aof.feed(['PEXPIREAT', key, str(lifetime_milliseconds(self.lifetimes[key]))])
+            elif key not in self.data:
+                self.aof.feed(['DEL', key])
+            return
+        if name == 'SET':
+            if self.set_written:
+                self.aof.feed(['SET', args[0], args[1]])
+                if args[0] in self.lifetimes:
+                    self.aof.feed(['PEXPIREAT', args[0], str(lifetime_milliseconds(self.lifetimes[args[0]]))])
+            return
+        self.aof.feed([name, *args])
+
+    def cron(self):
+        """
+        Periodic housekeeping: active expiry cycle, completion of background saves and rewrites,
+        and flushing the append only file to disk.
+        """
+        self.clean(len(self.expiry), ACTIVE_EXPIRE_CRON_BUDGET)
+        self.reap_child()
+        if self.aof is not None:
+            self.aof.flush()
+            self.aof.sync()
+
+    def configure(self):
+        """
+        Reads the limits of the compact encodings, the slow log and maxmemory settings from config.
+        Keys are tracked for maxmemory only while it is set, and tracked anew when the policy changes
+        between LRU and LFU, which keep different access metadata.
+        """
+        self.hash_max_entries = int(self.config['hash-max-listpack-entries'])
+        self.hash_max_value = min(int(self.config['hash-max-listpack-value']), MAX_PACK_VALUE)
+        self.list_max_entries = int(self.config['list-max-listpack-size'])
+        self.list_max_value = min(int(self.config['list-max-listpack-value']), MAX_PACK_VALUE)
+        self.slowlog_threshold = int(self.config['slowlog-log-slower-than'])
+        if self.slowlog.maxlen != max(int(self.config['slowlog-max-len']), 0):
+            self.slowlog = deque(self.slowlog, maxlen=max(int(self.config['slowlog-max-len']), 0))
+
+        maxmemory: int = parse_memory(self.config['maxmemory']) or 0
+        policy: str = self.config['maxmemory-policy']
+        if maxmemory == 0:
+            self.key_list, self.key_positions, self.key_access = [], {}, array('I')
+        tracked: bool = self.maxmemory > 0 and self.maxmemory_policy.endswith('lfu') == policy.endswith('lfu')
+        self.maxmemory, self.maxmemory_policy = maxmemory, policy
+        self.maxmemory_samples = max(int(self.config['maxmemory-samples']), 1)
+        if maxmemory > 0 and not tracked:
+            self.track_keys()
+
+    def compact(self, value):
+        """
+        Returns value in the most compact encoding allowed for it by the configured limits.
+        """
+        if isinstance(value, str):
+            return compact_string(value)
+        if isinstance(value, deque):
+            if len(value) <= self.list_max_entries and all(len(element) <= self.list_max_value for element in value):
+                return ListPack(value)
+            return value
+        if isinstance(value, dict):
+            if len(value) <= self.hash_max_entries and \
+                    all(len(field) <= self.hash_max_value and len(text) <= self.hash_max_value
+                        for field, text in value.items()):
+                return HashPack(text for pair in value.items() for text in pair)
+            return {sys.intern(field): text for field, text in value.items()}
+        return value
+
+    def path(self, name: str) -> str:
+        """
+        Returns the path of the file named by configuration parameter name.
+        """
+        return os.path.join(self.config['dir'], self.config[name])
+
+    def dump_items(self):
+        """
+        Yields (key, value, lifetime) for every key, lifetime being None for keys without one.
+        """
+        lifetimes: dict[str,float] = self.lifetimes
+        for key, value in self.data.items():
+            yield key, value, lifetimes.get(key)
+
+    def load(self):
+        """
+        Loads the data set saved on disk: the append only file if appendonly is yes and the file exists,
+        otherwise the snapshot if it exists. Then opens the append only file if appendonly is yes.
+        Keys are not evicted while loading, even if the data set is larger than maxmemory.
+        """
+        aof_path: str = self.path('appendfilename')
+        intact: bool = False
+        maxmemory, self.maxmemory = self.maxmemory, 0       # nothing is evicted while loading
+        if self.config['appendonly'] == 'yes' and os.path.exists(aof_path):
+            intact = self.load_aof(aof_path)
+        elif os.path.exists(self.path('dbfilename')):
+            self.load_snapshot(self.path('dbfilename'))
+        self.maxmemory = maxmemory
+        if maxmemory > 0:
+            self.track_keys()
+        if self.config['appendonly'] == 'yes':
+            self.start_aof(rewrite=not intact)
+
+    def load_snapshot(self, path: str):
+        """
+        Streams the keys of a snapshot into the data set, in their compact encodings. Lifetimes are absolute,
+        so keys that expired while the snapshot was on disk are dropped as they are read.
+        """
+        data: dict[str,any] = self.data
+        lifetimes: dict[str,float] = self.lifetimes
+        compact: callable = self.compact
+        for key, value, lifetime in read_snapshot(path):
+            data[key] = compact(value)
+            if lifetime is not None:
+                lifetimes[key] = lifetime
+        self.expiry = [(lifetime, key) for key, lifetime in lifetimes.items()]
+        heapq.heapify(self.expiry)
+
+    def load_aof(self, path: str) -> bool:
+        """
+        Replays the commands logged in an append only file, reading it in chunks.
+        Returns False if the file ends with a partially written command, which is ignored.
+        """
+        parser = RespParser()
+        with open(path, 'rb') as file:
+            while len(chunk := file.read(SNAPSHOT_CHUNK)) > 0:
+                self.execute_batch(parser.feed(chunk))
+                if parser.error is not None:
+                    raise Exception(f'Bad file format reading the append only file: {parser.error}')
+        if parser.remaining > 0 or len(parser.buffer) > 0:
+            print('!!! Warning: short read while loading the AOF file, ignoring the last partial command')
+            return False
+        return True
+
+    def start_aof(self, rewrite: bool):
+        """
+        Opens the append only file, first rewriting it from the data set if rewrite is set.
+        """
+        path: str = self.path('appendfilename')
+        if rewrite:
+            temp: str = f'{path}.rewrite.tmp'
+            write_rewrite(temp, self.dump_items())
+            os.replace(temp, path)
+        self.aof = AppendOnlyFile(path, self.config['appendfsync'])
+
+    def start_child(self, kind: str, write: callable, path: str):
+        """
+        param kind: 'save' or 'rewrite'
+        param write: write_snapshot or write_rewrite
+        param path: file to write
+
+        Writes the data set to path in the background, so commands keep running meanwhile. Where fork is
+        available a child process writes the data set as it was when forked, without copying it. Elsewhere
+        a thread writes a copy of the data set.
+        """
+        if hasattr(os, 'fork'):
+            pid: int = os.fork()
+            if pid == 0:                    # child process
+                code: int = 0
+                try:
+                    write(path, self.dump_items())
+                except BaseException:
+                    code = 1
+                os._exit(code)
+            self.child = (kind, pid)
+        else:
+            items: list = [(key, value if isinstance(value, STRING_TYPES) else value.copy(), lifetime)
+                           for key, value, lifetime in self.dump_items()]
+            executor = ThreadPoolExecutor(max_workers=1)
+            self.child = (kind, executor.submit(write, path, items))
+            executor.shutdown(wait=False)
+
+    def reap_child(self):
+        """
+        Completes a background save or rewrite once it has finished.
+        """
+        if self.child is None:
+            return
+        kind, job = self.child
+        if isinstance(job, int):
+            pid, status = os.waitpid(job, os.WNOHANG)
+            if pid == 0:
+                return
+            succeeded: bool = os.waitstatus_to_exitcode(status) == 0
+        else:
+            if not job.done():
+                return
+            succeeded: bool = job.exception() is None
+        self.child = None
+        if kind == 'save':
+            if succeeded:
+                self.last_save = time.time()
+            else:
+                print('Background saving error')
+        else:
+            self.finish_rewrite(succeeded)
+
+    def finish_rewrite(self, succeeded: bool):
+        """
+        Appends the commands logged since a background rewrite started to the rewritten file,
+        then replaces the append only file with it.
+        """
+        path: str = self.path('appendfilename')
+        temp: str = f'{path}.rewrite.tmp'
+        rewrite: bytearray = None
+        if self.aof is not None:
+            self.aof.flush()
+            rewrite, self.aof.rewrite = self.aof.rewrite, None
+        if not succeeded:
+            print('Background AOF rewrite error')
+            if os.path.exists(temp):
+                os.remove(temp)
+            return
+        if rewrite:
+            with open(temp, 'ab') as file:
+                file.write(rewrite)
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temp, path)
+        if self.aof is not None:
+            self.aof.reopen()
+
+    def close(self):
+        """
+        Flushes the append only file to disk and closes it.
+        """
+        if self.aof is not None:
+            self.aof.close()
+            self.aof = None
+
+    def redis_help(self, args: list[str]):
+        """
+        Returns doc strings for functions associated with provided Redis command strings
+        If no commands are provided, all commands are printed out.
+
+        param args: List of Redis command strings.
+        """
+        # list of command strings ['get', 'SET', 'Help']
+        command_strings: list[str] = args if len(args) > 0 else list(self.commands.keys())
+        # list of command strings concatenated to their doc strings
+        result: list[str] = []
+        for com in command_strings:
+            command: callable = self.commands.get(com.upper())
+            if command is None:
+                raise NameError(f"unknown command '{com}'")
+            result.append(com.upper() + command.__doc__)
+
+        return Text('\n'.join(result))
+
+    def redis_set(self, args: list[str]):
+        """
+        Set key to hold the string value. If key already holds a value, it is overwritten, regardless of its type.
+        Any previous time to live associated with the key is discarded on successful SET operation.
+
+        The SET command supports a set of options that modify its behavior:
+            EX seconds -- Set the specified expire time, in seconds (a positive integer).
+            PX milliseconds -- Set the specified expire time, in milliseconds (a positive integer).
+            EXAT timestamp-seconds -- Set the specified Unix time at which the key will expire, in seconds (a positive integer).
+            PXAT timestamp-milliseconds -- Set the specified Unix time at which the key will expire, in milliseconds (a positive integer).
+            NX -- Only set the key if it does not already exist.
+            XX -- Only set the key if it already exists.
+            KEEPTTL -- Retain the time to live associated with the key.
+            GET -- Return the old string stored at key, or nil if key did not exist.
+                   An error is returned and SET aborted if the value stored at key is not a string.
+
+        param args: ['key', 'value', options = ['NX' | 'XX'] ['GET'] ['EX' 'seconds' | 'PX' 'milliseconds' | 'EXAT' 'unix-time-seconds' | 'PXAT' 'unix-time-milliseconds' | 'KEEPTTL'] ]
+
+        Nil reply: GET not given: Operation was aborted (conflict with one of the XX/NX options).
+        Simple string reply: OK. GET not given: The key was set.
+        Nil reply: GET given: The key didn't exist before the SET.
+        Bulk string reply: GET given: The previous value of the key.
+
+        """
+
+        if len(args) < 2:
+            raise ValueError
+
+        key, value, *opts = args
+
+        self.set_written = False
+        settable: bool = True
+        result = Status('OK')
+
+        if len(opts) > 0:
+            time_to_live: float = None
+            condition: str = None       # NX or XX
+            get: bool = False
+            expiry: str = None          # EX, PX, EXAT, PXAT or KEEPTTL
+            milliseconds: int = 0
+
+            # options in order, each at most once: [NX|XX] [GET] [EX|PX|EXAT|PXAT time|KEEPTTL]
+            i: int = 0
+            while i < len(opts):
+                option: str = opts[i].upper()
+                if option in ('NX', 'XX') and condition is None:
+                    condition = option
+                elif option == 'GET' and not get:
+                    get = True
+                elif option == 'KEEPTTL' and expiry is None:
+                    expiry = option
+                elif option in ('EX', 'PX', 'EXAT', 'PXAT') and expiry is None and i + 1 < len(opts):
+                    expiry = option
+                    i += 1
+                    amount: int = parse_int(opts[i])
+                    milliseconds = amount * 1000 if option in ('EX', 'EXAT') else amount
+                    if option in ('EX', 'PX'):
+                        milliseconds += int(time.time() * 1000)
+                    if amount <= 0 or milliseconds >= 2 ** 63:      # the deadline must fit a 64 bit integer
+                        raise Exception("invalid expire time in 'set' command")
+                else:
+                    raise SyntaxError
+                i += 1
+
+            if condition == 'NX':
+                settable = self.lookup(key) is None
+            elif condition == 'XX':
+                settable = self.lookup(key) is not None
+            if not settable: return None
+            if get:
+                result = self.redis_get([key])
+            if expiry == 'KEEPTTL':
+                time_to_live = self.lifetimes.get(key)
+            elif expiry is not None:
+                time_to_live = milliseconds / 1000
+
+            self.data[key] = compact_string(value)
+            self.set_written = True
+            if time_to_live is not None:
+                self.set_lifetime(key, time_to_live)
+            else:
+                self.lifetimes.pop(key, None)
+            return result   # either OK or value from GET
+
+        self.data[key] = compact_string(value)
+        self.lifetimes.pop(key, None)   # any previous time to live is discarded
+        self.set_written = True
+        return result
+
+    def redis_get(self, args: list[str]):
+        """
+        Get the value of key. If the key does not exist the special value nil is returned.
+        An error is returned if the value stored at key is not a string, because GET only handles string values.
+        Ignores trailing arguments.
+
+        param args: [key]
+
+        Bulk string reply: the value of the key.
+        Nil reply: if the key does not exist.
+        """
+        if len(args) != 1:
+            raise ValueError
+        key = args[0]
+        value = self.lookup(key)
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value
+        if isinstance(value, int):
+            return str(value)
+        raise TypeError
+
+    def redis_mget(self, args: list[str]):
+        """
+        Returns the values of all specified keys. For every key that does not hold a string value or does not exist,
+        the special value nil is returned. Because of this, the operation never fails. Supports multiple inputs.
+
+        param args: [key, key, key, ...]
+
+        Array reply: a list of values at the specified keys.
+        """
+        result = []
+        for key in args:
+            value = self.lookup(key)
+            result.append(str(value) if isinstance(value, STRING_TYPES) else None)
+        return result
+
+    def redis_delete(self, args: list[str]):
+        """
+        Removes the specified keys. A key is ignored if it does not exist.
+
+        param args: [key, key, key, ...]
+
+        Integer reply: the number of keys that were removed.
+        """
+        count=0
+        for arg in args:
+            count += 1 if self.lookup(arg) is not None and self.delete_key(arg) else 0
+        return count
+
+    def redis_left_push(self, args: list[str]):
+        """
+        Insert all the specified values at the head of the list stored at key.
+        If key does not exist, it is created as empty list before performing the push operations.
+        When key holds a value that is not a list, an error is returned.
+
+        It is possible to push multiple elements using a single command call just specifying multiple arguments
+        at the end of the command. Elements are inserted one after the other to the head of the list, from the
+        leftmost element to the rightmost element.
+
+        param args: [key, element, element, element, ...]
+
+        Integer reply: the length of the list after the push operation.
+        """
+        return self.push(args, left=True)
+
+    def redis_right_push(self, args: list[str]):
+        """
+        Insert all the specified values at the tail of the list stored at key.
+        If key does not exist, it is created as empty list before performing the push operation.
+        When key holds a value that is not a list, an error is returned.
+
+        It is possible to push multiple elements using a single command call just specifying multiple arguments
+        at the end of the command. Elements are inserted one after the other to the tail of the list, from the
+        leftmost element to the rightmost element.
+
+        param args: [key, element, element, element, ...]
+
+        Integer reply: the length of the list after the push operation.
+        """
+        return self.push(args, left=False)
+
+    def push(self, args: list[str], left: bool):
+        """
+        Pushes elements onto the head (left) or tail of the list at args[0], in O(number of elements) time.
+        """
+        if len(args) < 2:
+            raise ValueError
+
+        name, *elements = args
+
+        value: deque = self.lookup(name)
+        if value is None:
+            value = self.data[name] = ListPack()
+        elif not isinstance(value, LIST_TYPES):
+            raise TypeError
+
+        if isinstance(value, ListPack) and (len(value) + len(elements) > self.list_max_entries or
+                                            max(map(len, elements)) > self.list_max_value):
+            value = self.data[name] = deque(value)     # outgrew the compact encoding
+
+        if left:
+            value.extendleft(elements)  # pushes one after the other, so the last element ends up first
+        else:
+            value.extend(elements)
+        return len(value)
+
+    def redis_left_pop(self, args: list[str]):
+        """
+        Removes and returns the first elements of the list stored at key.
+
+        By default, the command pops a single element from the beginning of the list.
+        When provided with the optional count argument, the reply will consist of up
+        to count elements, depending on the list's length.
+
+        Nil reply: if the key does not exist.
+        Bulk string reply: when called without the count argument, the value of the first element.
+        Array reply: when called with the count argument, a list of popped elements.
+
+        param args: [key, count]
+        """
+        return self.pop(args, left=True)
+
+    def redis_right_pop(self, args: list[str]):
+        """
+        Removes and returns the last elements of the list stored at key.
+
+        By default, the command pops a single element from the end of the list.
+        When provided with the optional count argument, the reply will consist of up
+        to count elements, depending on the list's length.
+
+        Nil reply: if the key does not exist.
+        Bulk string reply: when called without the count argument, the value of the last element.
+        Array reply: when called with the count argument, a list of popped elements.
+
+        param args: [key, count]
+        """
+        return self.pop(args, left=False)
+
+    def pop(self, args: list[str], left: bool):
+        """
+        Pops up to count elements from the head (left) or tail of the list at args[0],
+        in O(count) time. The key is removed once the list is empty.
+        """
+        if len(args) < 1 or len(args) > 2:
+            raise ValueError
+
+        name, *count = args
+
+        count = '1' if len(count) == 0 else count[0]
+
+        if count.isascii() and count.isdigit():
+            count = int(count)
+        else:
+            raise IndexError
+
+        value: deque = self.lookup(name)
+
+        if value is None:
+            return None
+        if not isinstance(value, LIST_TYPES):
+            raise TypeError
+
+        take = value.popleft if left else value.pop
+        removed = [take() for _ in range(min(count, len(value)))]
+        if len(value) == 0:
+            self.delete_key(name)
+
+        if count == 1:
+            return removed[0]
+        return removed
+
+    def redis_range(self, args: list[str]):
+        """
+        Returns the specified elements of the list stored at key.
+        The offsets start and stop are zero-based indexes, with 0 being the first element of the list
+        (the head of the list), 1 being the next element and so on.
+
+        These   offsets can also be negative numbers indicating offsets starting at the end of the list.
+        For example, -1 is the last element of the list, -2 the penultimate, and so on.
+
+        param args: ['key', 'start', 'stop']
+        """
+        if len(args) != 3:
+            raise ValueError
+
+        name = args[0]
+        start = parse_int(args[1])
+        end = parse_int(args[2])
+
+        value: deque = self.lookup(name)
+
+        if value is None: return []
+
+        if isinstance(value, LIST_TYPES):
+            start, end = self.list_bounds(start, end, len(value))
+            if start > end: return []
+
+            # walk from whichever end of the list is nearer, reading only the requested slice
+            if start <= len(value) - 1 - end:
+                result = list(islice(value, start, end + 1))
+            else:
+                result = list(islice(reversed(value), len(value) - 1 - end, len(value) - start))
+                result.reverse()
+
+            return result
+        else:
+            raise TypeError
+
+    def redis_list_length(self, args: list[str]):
+        """
+        Returns the length of the list stored at key. If key does not exist, it is interpreted as an empty list
+        and 0 is returned. An error is returned when the value stored at key is not a list.
+
+        param args: ['key']
+
+        Integer reply: the length of the list.
+        """
+        if len(args) != 1:
+            raise ValueError
+
+        value: deque = self.lookup(args[0])
+        if value is None:
+            return 0
+        if not isinstance(value, LIST_TYPES):
+            raise TypeError
+        return len(value)
+
+    def redis_list_index(self, args: list[str]):
+        """
+        Returns the element at index index in the list stored at key. The index is zero-based, so 0 means the
+        first element, 1 the second element and so on. Negative indices can be used to designate elements
+        starting at the tail of the list. Here, -1 means the last element, -2 means the penultimate and so forth.
+
+        param args: ['key', 'index']
+
+        Bulk string reply: the requested element.
+        Nil reply: when index is out of range.
+        """
+        if len(args) != 2:
+            raise ValueError
+
+        name = args[0]
+        index = parse_int(args[1])
+
+        value: deque = self.lookup(name)
+        if value is None:
+            return None
+        if not isinstance(value, LIST_TYPES):
+            raise TypeError
+        if index < -len(value) or index >= len(value):
+            return None
+        return value[index]
+
+    def redis_list_trim(self, args: list[str]):
+        """
+        Trim an existing list so that it will contain only the specified range of elements specified.
+        Both start and stop are zero-based indexes, where 0 is the first element of the list (the head),
+        1 the next element and so on. Negative indexes count from the end of the list.
+        Out of range indexes will not produce an error. If start is larger than the end of the list,
+        or start > end, the result will be an empty list (which causes key to be removed).
+
+        param args: ['key', 'start', 'stop']
+
+        Simple string reply: OK.
+        """
+        if len(args) != 3:
+            raise ValueError
+
+        name = args[0]
+        start = parse_int(args[1])
+        end = parse_int(args[2])
+
+        value: deque = self.lookup(name)
+        if value is None:
+            return Status('OK')
+        if not isinstance(value, LIST_TYPES):
+            raise TypeError
+
+        start, end = self.list_bounds(start, end, len(value))
+        if start > end:
+            self.delete_key(name)
+        elif (end - start + 1) * 2 < len(value):   # cheaper to copy the kept elements
+            self.data[name] = type(value)(islice(value, start, end + 1))
+        else:                                       # cheaper to pop the removed elements
+            for _ in range(len(value) - 1 - end):
+                value.pop()
+            for _ in range(start):
+                value.popleft()
+        return Status('OK')
+
+    @staticmethod
+    def list_bounds(start: int, end: int, length: int) -> tuple[int, int]:
+        """
+        Converts Redis start and stop offsets (inclusive, possibly negative) into list indexes.
+        Returns start > end when the range is empty.
+        """
+        if start < 0: start = max(start + length, 0)
+        if end < 0: end += length
+        if end >= length: end = length - 1
+        return start, end
+
+    def redis_hash_set(self, args: list[str]):
+        """
+        Sets the specified fields to their respective values in the hash stored at key.
+        This command overwrites the values of specified fields that exist in the hash.
+        If key doesn't exist, a new key holding a hash is created.
+        Accepts multiple field and value arguments.
+        Ignores trailing field if no value is specified.
+        Empty fields are not permitted.
+
+        param args: ['key', 'field', 'value', ...]
+
+        Integer reply: the number of fields that were added.
+        """
+        if len(args) < 3 or len(args) % 2 == 0:
+            raise ValueError
+
+        key, *elements = args
+
+        value = self.lookup(key)
+        if value is None:
+            value = self.data[key] = HashPack()
+        elif not isinstance(value, HASH_TYPES):
+            raise TypeError
+
+        if len(elements) % 2 == 1: elements.pop()
+
+        if isinstance(value, HashPack) and max(map(len, elements)) > self.hash_max_value:
+            value = self.data[key] = self.expand_hash(value)
+
+        fields: int = len(value)
+        if isinstance(value, HashPack):
+            for i in range(0, len(elements), 2):
+                value[elements[i]] = elements[i + 1]
+            if len(value) > self.hash_max_entries:
+                self.data[key] = self.expand_hash(value)
+        else:
+            for i in range(0, len(elements), 2):
+                value[sys.intern(elements[i])] = elements[i + 1]    # field names repeat across hashes
+        return len(value) - fields
+
+    @staticmethod
+    def expand_hash(value: HashPack) -> dict:
+        """
+        Converts a hash that outgrew the compact encoding to a dict.
+        """
+        return {sys.intern(field): text for field, text in value.items()}
+
+    def redis_hash_get(self, args: list[str]):
+        """
+        Returns the value associated with field in the h_set stored at key.
+        Does not support multiple field values. Ignores trailing arguments.
+
+        param args: ['key', 'field']
+
+        Bulk string reply: The value associated with the field.
+        Nil reply: If the field is not present in the h_set or key does not exist.
+        """
+        if len(args) != 2:
+            raise ValueError
+
+        name, key = args
+        h_set = self.lookup(name)
+        if isinstance(h_set, HASH_TYPES):
+            value = h_set.get(key)
+            return value
+        elif h_set is None:
+            return None
+        else:
+            raise TypeError
+
+    def redis_expire(self, args: list[str]):
+        """
+        Set a timeout on key. After the timeout has expired, the key will automatically be deleted.
+        The timeout will only be cleared by commands that delete or overwrite the contents of the key,
+        or by the PERSIST command. A non-positive timeout deletes the key immediately.
+
+        param args: ['key', 'seconds']
+
+        Integer reply: 1 if the timeout was set, 0 if the key does not exist.
+        """
+        if len(args) != 2:
+            raise ValueError
+
+        key, seconds = args
+        seconds = parse_int(seconds)
+        if not -2 ** 63 <= seconds * 1000 + int(time.time() * 1000) < 2 ** 63:    # deadline in milliseconds
+            raise Exception("invalid expire time in 'expire' command")
+
+        if self.lookup(key) is None:
+            return 0
+        if seconds <= 0:
+            self.delete_key(key)
+        else:
+            self.set_lifetime(key, time.time() + seconds)
+        return 1
+
+    def redis_pexpireat(self, args: list[str]):
+        """
+        Set the unix time, in milliseconds, at which key will expire. A time in the past deletes the key immediately.
+
+        param args: ['key', 'unix-time-milliseconds']
+
+        Integer reply: 1 if the timeout was set, 0 if the key does not exist.
+        """
+        if len(args) != 2:
+            raise ValueError
+
+        key, milliseconds = args
+        lifetime: float = parse_int(milliseconds) / 1000
+
+        if self.lookup(key) is None:
+            return 0
+        if lifetime <= time.time():
+            self.delete_key(key)
+        else:
+            self.set_lifetime(key, lifetime)
+        return 1
+
+    def redis_persist(self, args: list[str]):
+        """
+        Remove the existing timeout on key, turning the key from volatile (a key with an expire set)
+        to persistent (a key that will never expire as no timeout is associated).
+
+        param args: ['key']
+
+        Integer reply: 1 if the timeout was removed, 0 if the key does not exist or does not have a timeout.
+        """
+        if len(args) != 1:
+            raise ValueError
+
+        key = args[0]
+        if self.lookup(key) is None or self.lifetimes.pop(key, None) is None:
+            return 0
+        return 1
+
+    def redis_ttl(self, args: list[str]):
+        """
+        Returns the remaining time to live of a key that has a timeout, in seconds.
+
+        param args: ['key']
+
+        Integer reply: TTL in seconds.
+        Integer reply: -1 if the key exists but has no associated expiration.
+        Integer reply: -2 if the key does not exist.
+        """
+        if len(args) != 1:
+            raise ValueError
+        milliseconds = self.time_to_live(args[0])
+        return (milliseconds + 500) // 1000 if milliseconds >= 0 else milliseconds
+
+    def redis_pttl(self, args: list[str]):
+        """
+        Like TTL this command returns the remaining time to live of a key that has an expire set,
+        with the sole difference that TTL returns the amount of remaining time in seconds while
+        PTTL returns it in milliseconds.
+
+        param args: ['key']
+
+        Integer reply: TTL in milliseconds.
+        Integer reply: -1 if the key exists but has no associated expiration.
+        Integer reply: -2 if the key does not exist.
+        """
+        if len(args) != 1:
+            raise ValueError
+        return self.time_to_live(args[0])
+
+    def time_to_live(self, key: str) -> int:
+        """
+        Returns the remaining lifetime of key in milliseconds, -1 if it has none and -2 if it does not exist.
+        """
+        if self.lookup(key) is None:
+            return -2
+        lifetime = self.lifetimes.get(key)
+        if lifetime is None:
+            return -1
+        return max(0, round((lifetime - time.time()) * 1000))
+
+    def redis_multi(self, args: list[str]):
+        """
+        Marks the start of a transaction block. Subsequent commands will be queued for atomic execution using EXEC.
+
+        param args: []
+
+        Simple string reply: OK.
+        """
+        if len(args) != 0:
+            raise ValueError
+        if self.client.transaction is not None:
+            raise Exception('MULTI calls can not be nested')
+        self.client.transaction = []
+        self.client.dirty = False
+        return Status('OK')
+
+    def redis_exec(self, args: list[str]):
+        """
+        Executes all previously queued commands in a transaction as a single batch, so no command
+        from another client runs in between. If a command failed to queue, none of them are executed.
+
+        param args: []
+
+        Array reply: each element being the reply to each of the commands in the atomic transaction.
+        """
+        if len(args) != 0:
+            raise ValueError
+        transaction: list[list[str]] = self.client.transaction
+        if transaction is None:
+            raise Exception('EXEC without MULTI')
+        self.client.transaction = None
+        if self.client.dirty:
+            self.client.dirty = False
+            return Error('EXECABORT Transaction discarded because of previous errors.')
+        return self.execute_batch(transaction)
+
+    def redis_discard(self, args: list[str]):
+        """
+        Flushes all previously queued commands in a transaction.
+
+        param args: []
+
+        Simple string reply: OK.
+        """
+        if len(args) != 0:
+            raise ValueError
+        if self.client.transaction is None:
+            raise Exception('DISCARD without MULTI')
+        self.client.transaction = None
+        self.client.dirty = False
+        return Status('OK')
+
+    def redis_save(self, args: list[str]):
+        """
+        Synchronously saves the data set to the snapshot file. Commands are blocked until the save completes,
+        so BGSAVE is usually preferred.
+
+        param args: []
+
+        Simple string reply: OK.
+        """
+        if len(args) != 0:
+            raise ValueError
+        if self.child is not None and self.child[0] == 'save':
+            raise Exception('Background save already in progress')
+        write_snapshot(self.path('dbfilename'), self.dump_items())
+        self.last_save = time.time()
+        return Status('OK')
+
+    def redis_bgsave(self, args: list[str]):
+        """
+        Saves the data set to the snapshot file in the background. Commands keep running while it is written.
+
+        param args: []
+
+        Simple string reply: Background saving started.
+        """
+        if len(args) != 0:
+            raise ValueError
+        if self.child is not None:
+            raise Exception('Background save or append only file rewrite already in progress')
+        self.start_child('save', write_snapshot, self.path('dbfilename'))
+        return Status('Background saving started')
+
+    def redis_bgrewriteaof(self, args: list[str]):
+        """
+        Rewrites the append only file in the background as the shortest sequence of commands that rebuilds
+        the current data set. Commands executed meanwhile are added to the rewritten file when it completes.
+
+        param args: []
+
+        Simple string reply: Background append only file rewriting started.
+        """
+        if len(args) != 0:
+            raise ValueError
+        if self.child is not None:
+            raise Exception('Background save or append only file rewrite already in progress')
+        if self.aof is not None:
+            self.aof.flush()
+            self.aof.rewrite = bytearray()
+        self.start_child('rewrite', write_rewrite, f"{self.path('appendfilename')}.rewrite.tmp")
+        return Status('Background append only file rewriting started')
+
+    def redis_config(self, args: list[str]):
+        """
+        Reads or changes configuration parameters.
+            GET pattern [pattern ...] -- Returns the parameters matching any glob style pattern, with their values.
+            SET parameter value -- Sets a parameter. Setting appendonly to yes rewrites the append only file
+                                   from the data set before logging to it.
+
+        Parameters:
+            dir -- directory holding the snapshot and append only files
+            dbfilename -- snapshot file name
+            appendonly -- yes or no: log every write command to the append only file
+            appendfilename -- append only file name
+            appendfsync -- always, everysec or no: how often the append only file is flushed to disk
+            hash-max-listpack-entries -- max fields of a hash in the compact encoding
+            hash-max-listpack-value -- max length of a field or value of a hash in the compact encoding
+            list-max-listpack-size -- max elements of a list in the compact encoding
+            list-max-listpack-value -- max length of an element of a list in the compact encoding
+            slowlog-log-slower-than -- microseconds a command must take to be logged, negative to log none
+            slowlog-max-len -- max entries kept in the slow log
+            maxmemory -- max bytes used by keys and values, e.g. 100mb, 0 for no limit. Once it is reached, keys are
+                         evicted before commands that allocate memory, or the commands fail if none can be.
+            maxmemory-policy -- keys evicted: noeviction, allkeys-lru, allkeys-lfu, allkeys-random, volatile-lru,
+                                volatile-lfu, volatile-random or volatile-ttl
+            maxmemory-samples -- keys sampled to choose each key to evict
+
+        param args: ['GET', pattern, ...] | ['SET', parameter, value]
+
+        Array reply: GET: parameter names followed by their values.
+        Simple string reply: SET: OK.
+        """
+        if len(args) < 2:
+            raise ValueError
+        action, *args = args
+        if action.upper() == 'GET':
+            result: list[str] = []
+            for name, value in self.config.items():
+                if any(fnmatch.fnmatchcase(name, pattern.lower()) for pattern in args):
+                    result += [name, value]
+            return result
+        if action.upper() != 'SET':
+            raise SyntaxError
+        if len(args) != 2:
+            raise ValueError
+
+        name, value = args[0].lower(), args[1]
+        if name not in self.config:
+            raise Exception(f"Unknown option or number of arguments for CONFIG SET - '{args[0]}'")
+        digits: str = value[1:] if value[:1] == '-' else value
+        if name == 'appendonly' and value.lower() not in ('yes', 'no') or \
+                name == 'appendfsync' and value.lower() not in ('always', 'everysec', 'no') or \
+                name == 'maxmemory-policy' and value.lower() not in MAXMEMORY_POLICIES or \
+                (parse_memory(value) is None if name == 'maxmemory' else
+                 CONFIG_DEFAULTS[name].isdigit() and not (digits.isascii() and digits.isdigit())):
+            raise Exception(f"Invalid argument '{value}' for CONFIG SET '{name}'")
+
+        if name in ('appendonly', 'appendfsync', 'maxmemory', 'maxmemory-policy'):
+            value = value.lower()
+        self.config[name] = value
+        if name == 'appendonly' and value == 'yes' and self.aof is None:
+            self.start_aof(rewrite=True)
+        elif name == 'appendonly' and value == 'no':
+            self.close()
+        elif name == 'appendfsync' and self.aof is not None:
+            self.aof.fsync = value
+        self.configure()
+        return Status('OK')
+
+    def redis_object(self, args: list[str]):
+        """
+        Inspects the internal encoding of the value stored at key.
+            ENCODING key -- Returns the encoding of the value:
+                int -- a string holding a 64 bit integer, stored as a number
+                embstr -- a string of at most 44 characters
+                raw -- a longer string
+                listpack -- a small list or hash, packed into a single buffer
+                quicklist -- a list in a deque of blocks
+                hashtable -- a hash in a dict
+
+        param args: ['ENCODING', 'key']
+
+        Bulk string reply: the encoding of the value.
+        Nil reply: if the key does not exist.
+        """
+        if len(args) != 2:
+            raise ValueError
+        if args[0].upper() != 'ENCODING':
+            raise SyntaxError
+
+        value = self.lookup(args[1])
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return 'embstr' if len(value) <= 44 else 'raw'
+        if isinstance(value, int):
+            return 'int'
+        if isinstance(value, Pack):
+            return 'listpack'
+        return 'quicklist' if isinstance(value, deque) else 'hashtable'
+
+    def redis_memory(self, args: list[str]):
+        """
+        Reports the memory used by the data set.
+            USAGE key [SAMPLES count] -- Returns the bytes of memory used by the key and its value. For lists and
+                                         hashes not in the compact encoding, count elements are measured to
+                                         estimate the rest (default 5, 0 to measure all of them).
+
+        param args: ['USAGE', 'key', options = ['SAMPLES' 'count']]
+
+        Integer reply: the memory usage in bytes.
+        Nil reply: if the key does not exist.
+        """
+        if len(args) < 2:
+            raise ValueError
+        if args[0].upper() != 'USAGE':
+            raise SyntaxError
+
+        key: str = args[1]
+        samples: int = MEMORY_USAGE_SAMPLES
+        if len(args) > 2:
+            if len(args) != 4 or args[2].upper() != 'SAMPLES':
+                raise SyntaxError
+            samples = parse_int(args[3])
+            if samples < 0:
+                raise IndexError
+
+        value = self.lookup(key)
+        if value is None:
+            return None
+        return sys.getsizeof(key) + value_size(value, samples)
+
+    def redis_info(self, args: list[str]):
+        """
+        Returns information and statistics about the server, as one field:value line each, in sections:
+            server -- general information about the process
+            clients -- connections to the server
+            memory -- memory used by the data set, counted while maxmemory is set and otherwise estimated
+                      from a sample of the keys, and the maxmemory settings
+            persistence -- snapshot and append only file
+            stats -- general statistics, including expired and evicted keys
+            commandstats -- calls, total, average and max microseconds, and failures by kind for each command
+            errorstats -- error replies by error code
+            keyspace -- keys and keys with a lifetime
+        With no sections given, or 'default', every section but commandstats is returned. 'all' returns every section.
+
+        param args: [section, ...]
+
+        Bulk string reply: the requested sections.
+        """
+        requested: set[str] = {section.lower() for section in args} or {'default'}
+        everything: bool = 'all' in requested or 'everything' in requested
+        if 'default' in requested or everything:
+            requested |= set(INFO_SECTIONS) - ({'commandstats'} if not everything else set())
+
+        result: list[str] = []
+        for section in INFO_SECTIONS:
+            if section in requested:
+                if len(result) > 0:
+                    result.append('')
+                result.append(f'# {section.capitalize()}')
+                result += [f'{field}:{value}' for field, value in self.info_section(section)]
+        return Text('\r\n'.join(result))
+
+    def info_section(self, section: str) -> list[tuple[str,any]]:
+        """
+        Returns the (field, value) lines of an INFO section.
+        """
+        if section == 'server':
+            return [('python_version', sys.version.split()[0]), ('process_id', os.getpid()),
+                    ('uptime_in_seconds', int(time.time() - self.started))]
+        if section == 'clients':
+            return [('connected_clients', self.connected_clients)]
+        if section == 'memory':
+            return [('used_memory_dataset', self.used_memory if self.maxmemory > 0 else self.dataset_memory()),
+                    ('used_memory_rss', resident_memory()), ('maxmemory', self.maxmemory),
+                    ('maxmemory_policy', self.maxmemory_policy)]
+        if section == 'persistence':
+            return [('aof_enabled', int(self.aof is not None)),
+                    ('rdb_bgsave_in_progress', int(self.child is not None and self.child[0] == 'save')),
+                    ('aof_rewrite_in_progress', int(self.child is not None and self.child[0] == 'rewrite')),
+                    ('rdb_last_save_time', int(self.last_save))]
+        if section == 'stats':
+            return [('total_commands_processed', sum(stats.calls for stats in self.command_stats.values())),
+                    ('total_connections_received', self.total_connections),
+                    ('expired_keys', self.expired_keys),
+                    ('evicted_keys', self.evicted_keys),
+                    ('expire_cycle_cpu_milliseconds', int(self.expire_cycle_seconds * 1000))]
+        if section == 'commandstats':
+            return [(f'cmdstat_{name.lower()}',
+                     f'calls={stats.calls},usec={stats.microseconds},'
+                     f'usec_per_call={stats.microseconds / stats.calls:.2f},usec_max={stats.max},'
+                     f'failed_calls={sum(stats.errors.values())}' +
+                     ''.join(f',failed_{kind}={count}' for kind, count in sorted(stats.errors.items())))
+                    for name, stats in sorted(self.command_stats.items())]
+        if section == 'errorstats':
+            return [(f'errorstat_{code}', f'count={count}') for code, count in sorted(self.error_stats.items())]
+        if len(self.data) == 0:
+            return []
+        return [('db0', f'keys={len(self.data)},expires={len(self.lifetimes)}')]
+
+    def dataset_memory(self) -> int:
+        """
+        Returns an estimate of the bytes of memory used by the data set, from the sizes of up to
+        INFO_MEMORY_SAMPLES keys and their values.
+        """
+        size: int = sys.getsizeof(self.data) + sys.getsizeof(self.lifetimes) + sys.getsizeof(self.expiry)
+        sampled: list = list(islice(self.data.items(), INFO_MEMORY_SAMPLES))
+        if len(sampled) == 0:
+            return size
+        measured: int = sum(sys.getsizeof(key) + value_size(value, 5) for key, value in sampled)
+        return size + measured * len(self.data) // len(sampled)
+
+    def redis_slowlog(self, args: list[str]):
+        """
+        Reads or resets the slow log, which keeps the latest commands that took longer than
+        slowlog-log-slower-than microseconds, up to slowlog-max-len of them.
+            GET [count] -- Returns the latest count entries, newest first (default 10, -1 for all). Each entry holds
+                           an id, the unix time the command ran, its execution microseconds, its arguments,
+                           the client address and the client name.
+            LEN -- Returns the number of entries.
+            RESET -- Removes every entry.
+
+        param args: ['GET', count] | ['LEN'] | ['RESET']
+
+        Array reply: GET: slow log entries.
+        Integer reply: LEN: number of entries.
+        Simple string reply: RESET: OK.
+        """
+        if len(args) < 1:
+            raise ValueError
+        action: str = args[0].upper()
+        if action == 'GET' and len(args) <= 2:
+            count: int = parse_int(args[1]) if len(args) == 2 else 10
+            if count < -1:
+                raise IndexError
+            entries = self.slowlog if count == -1 else islice(self.slowlog, count)
+            return [[id, timestamp, microseconds, list(logged), address, '']
+                    for id, timestamp, microseconds, logged, address in entries]
+        if action == 'LEN' and len(args) == 1:
+            return len(self.slowlog)
+        if action == 'RESET' and len(args) == 1:
+            self.slowlog.clear()
+            return Status('OK')
+        raise SyntaxError
+
+    def redis_latency(self, args: list[str]):
+        """
+        Reports the distribution of execution times of commands.
+            HISTOGRAM [command ...] -- For each command given, or every command executed so far, returns its
+                                       calls and a histogram of their execution microseconds. The histogram maps
+                                       powers of two to the number of calls that took at most that long.
+
+        param args: ['HISTOGRAM', command, ...]
+
+        Array reply: command names, each followed by its calls and histogram.
+        """
+        if len(args) < 1:
+            raise ValueError
+        if args[0].upper() != 'HISTOGRAM':
+            raise SyntaxError
+
+        names: list[str] = [com.upper() for com in args[1:]] or sorted(self.command_stats)
+        result: list = []
+        for name in names:
+            stats: CommandStats = self.command_stats.get(name)
+            if stats is None:
+                continue
+            histogram: list[int] = []
+            total: int = 0
+            last: int = max(i for i, count in enumerate(stats.histogram) if count > 0)
+            for i in range(last + 1):
+                total += stats.histogram[i]
+                if stats.histogram[i] > 0:
+                    histogram += [2 ** i, total]
+            result += [name.lower(), ['calls', stats.calls, 'histogram_usec', histogram]]
+        return result
+
+    def redis_quit(self, *_):
+        """
+        Terminates the Quiq Redis CLI. When serving, closes the connection of the client instead.
+        """
+        self.active = False
+        return Text('')
+
+
+async def serve(redis: Redis, host: str, port: int, reuse_port: bool = False):
+    """
+    param redis: database shared by all connections
+    param host: interface to listen on
+    param port: TCP port to listen on
+    param reuse_port: share the port with other processes serving it, the system balancing connections over them
+
+    Serves redis over RESP2 to any number of concurrent connections. Commands run one at a time on the
+    event loop, so each command sees the database exactly as the previous one left it.
+    """
+    async def cron():
+        while True:                         # expires keys that are never accessed again, completes background saves
+            await asyncio.sleep(CRON_INTERVAL)
+            redis.cron()
+
+    server = await asyncio.start_server(lambda reader, writer: handle_client(redis, reader, writer), host, port,
+                                        reuse_port=reuse_port or None)
+    print(f"Quiq Redis listening on {', '.join(str(sock.getsockname()) for sock in server.sockets)}")
+    housekeeping = asyncio.create_task(cron())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        housekeeping.cancel()
+
+
+async def handle_client(redis: Redis, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Reads requests from one connection and writes back the replies. The commands completed by a read are
+    executed as one batch and all their replies are written together, so pipelined requests are answered in one write.
+    A database that executes batches asynchronously, such as a sharded one, is awaited instead.
+    """
+    parser = RespParser()
+    execute_async = getattr(redis, 'execute_batch_async', None)
+    client = Client('%s:%s' % writer.get_extra_info('peername')[:2])
+    redis.connected_clients += 1
+    redis.total_connections += 1
+    try:
+        while True:
+            data: bytes = await reader.read(READ_SIZE)
+            if len(data) == 0:
+                break
+            out = bytearray()
+            closing: bool = False
+            commands: list[list[str]] = parser.feed(data)
+            for i, (com, *_) in enumerate(commands):
+                if com.upper() == 'QUIT':           # commands after QUIT are never executed
+                    commands = commands[:i]
+                    closing = True
+                    break
+            redis.client = client
+            replies: list = redis.execute_batch(commands) if execute_async is None else await execute_async(commands)
+            for reply in replies:
+                encode_resp(reply, out)
+            if closing:
+                encode_resp(Status('OK'), out)
+            if parser.error is not None and not closing:
+                encode_resp(Error(f"ERR Protocol error: {parser.error}"), out)
+                closing = True
+            writer.write(out)
+            await writer.drain()
+            if closing:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        redis.connected_clients -= 1
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quiq Redis')
+    parser.add_argument('--serve', action='store_true', help='serve RESP2 over TCP instead of running the CLI')
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on when serving')
+    parser.add_argument('--port', type=int, default=6379, help='TCP port to listen on when serving')
+    for name, value in CONFIG_DEFAULTS.items():
+        parser.add_argument(f'--{name}', dest=name, default=value, help=f'configuration parameter (default: {value})')
+    options = parser.parse_args()
+
+    redis = Redis({name: getattr(options, name) for name in CONFIG_DEFAULTS})
+    try:
+        redis.load()
+    except Exception as e:
+        print(f"Fatal error loading the DB: {e}")
+        sys.exit(1)
+
+    if options.serve:
+        try:
+            asyncio.run(serve(redis, options.host, options.port))
+        except KeyboardInterrupt:
+            pass
+        redis.close()
+        return
+
+    print("------------------------------------------------------")
+    print("                    QUIQ REDIS CLI                    ")
+    print("------------------------------------------------------")
+    print("Enter HELP to see all commands with descriptions")
+    print("Enter HELP <command> to see a description of a command")
+    print("Enter QUIT to terminate the program")
+    print("------------------------------------------------------")
+
+    while redis.active:
+        print("command> ", end='')
+        in_str: str = input()
+        if len(in_str) == 0: continue
+        com, *args = in_str.split(' ')
+        redis.cron()
+        redis.execute_command(com, args)
+
+    redis.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file